@@ -0,0 +1,162 @@
+import os
+import random
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torchvision.transforms.functional import to_tensor
+from src.image_utils import crop_background, flatten_to_rgb
+
+# ITU-R 601 luma weights, as used by PIL's "L" conversion
+_LUMA = (0.299, 0.587, 0.114)
+
+def composite_batch(backgrounds: torch.Tensor, foregrounds: torch.Tensor, alpha: torch.Tensor) -> torch.Tensor:
+    """
+    Composites foregrounds onto backgrounds, the batched tensor counterpart of
+    `image_utils.composite_images`.
+
+    Args:
+        backgrounds: (B, 3, H, W) images in [0, 1].
+        foregrounds: (B, 3, H, W) images in [0, 1].
+        alpha: (B, 1, H, W) foreground opacity in [0, 1].
+
+    Returns:
+        The composited (B, 3, H, W) images.
+    """
+    return foregrounds * alpha + backgrounds * (1 - alpha)
+
+def load_backgrounds(bg_dir: str, size: int = 320, count: int = 64, seed: int = 0) -> torch.Tensor:
+    """
+    Decodes a bounded bank of square background crops for background swapping.
+
+    Up to `count` images are picked from `bg_dir`, and a random square of
+    each is cropped with `crop_background` and resized to `size`.
+
+    Returns:
+        A (N, 3, size, size) tensor in [0, 1].
+    """
+    rng = random.Random(seed)
+    names = sorted(f for f in os.listdir(bg_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    crops = []
+    for name in rng.sample(names, min(count, len(names))):
+        with Image.open(os.path.join(bg_dir, name)) as image:
+            image = flatten_to_rgb(image)
+        side = min(image.size)
+        crop = crop_background(image, side, side, rng).resize((size, size), Image.Resampling.BILINEAR)
+        crops.append(to_tensor(crop))
+    if not crops:
+        raise ValueError(f"No background images found in {bg_dir}.")
+    return torch.stack(crops)
+
+class BatchAugmentation:
+    """
+    Random augmentation of whole batches on the device they live on.
+
+    Flip, scale and crop position are combined into one affine transform per
+    sample, and images and masks are resampled together through the same
+    sampling grid, so they stay aligned. Areas that a zoom-out uncovers
+    become white image and empty mask, like transparent regions in
+    preprocessing. A share of the samples then gets its background swapped
+    for one from a background bank, using the mask as alpha, and finally
+    brightness, contrast and saturation are jittered.
+
+    All random draws come from a generator on the target device, seeded with
+    `seed`, so a run is reproducible. `state_dict` and `load_state_dict`
+    carry the generator state across checkpoints.
+
+    Args:
+        device: The device batches are augmented on.
+        seed: Seed of the random generator.
+        flip_prob: Probability of a horizontal flip.
+        scale_range: Range of the zoom factor; values above 1 zoom in (crop), below 1 zoom out.
+        translate: Maximum shift of the crop position, as a fraction of the image size.
+        brightness: Maximum relative change of brightness.
+        contrast: Maximum relative change of contrast.
+        saturation: Maximum relative change of saturation.
+        backgrounds: Optional (N, 3, H, W) background bank, see `load_backgrounds`.
+        background_prob: Probability of swapping the background of a sample.
+    """
+    def __init__(self, device, seed: int = 0, flip_prob: float = 0.5, scale_range=(0.8, 1.25),
+                 translate: float = 0.1, brightness: float = 0.2, contrast: float = 0.2,
+                 saturation: float = 0.2, backgrounds: torch.Tensor = None, background_prob: float = 0.5):
+        self.device = torch.device(device)
+        self.generator = torch.Generator(device=self.device)
+        self.generator.manual_seed(seed)
+        self.flip_prob = flip_prob
+        self.scale_range = scale_range
+        self.translate = translate
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.backgrounds = None if backgrounds is None else backgrounds.to(self.device)
+        self.background_prob = background_prob
+        self.luma = torch.tensor(_LUMA, device=self.device).view(1, 3, 1, 1)
+
+    def state_dict(self) -> dict:
+        return {"generator": self.generator.get_state()}
+
+    def load_state_dict(self, state: dict) -> None:
+        self.generator.set_state(state["generator"])
+
+    def _uniform(self, batch_size: int, low: float, high: float) -> torch.Tensor:
+        return torch.rand(batch_size, device=self.device, generator=self.generator) * (high - low) + low
+
+    def _geometry(self, images: torch.Tensor, masks: torch.Tensor):
+        batch_size = images.shape[0]
+        zoom = self._uniform(batch_size, *self.scale_range)
+        flip = torch.rand(batch_size, device=self.device, generator=self.generator) < self.flip_prob
+        # Zooming in leaves room to move the crop window around inside the image
+        shift = (1 - 1 / zoom).abs() + self.translate
+        tx = self._uniform(batch_size, -1, 1) * shift
+        ty = self._uniform(batch_size, -1, 1) * shift
+
+        theta = torch.zeros(batch_size, 2, 3, device=self.device)
+        theta[:, 0, 0] = torch.where(flip, -1.0, 1.0) / zoom
+        theta[:, 1, 1] = 1 / zoom
+        theta[:, 0, 2] = tx
+        theta[:, 1, 2] = ty
+
+        # One resampling pass for image, mask and coverage keeps them aligned
+        stacked = torch.cat((images, masks, torch.ones_like(masks)), dim=1)
+        grid = F.affine_grid(theta, list(stacked.shape), align_corners=False)
+        warped = F.grid_sample(stacked, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+        images, masks, coverage = warped[:, :3], warped[:, 3:4], warped[:, 4:5]
+        return composite_batch(torch.ones_like(images), images, coverage), masks
+
+    def _swap_backgrounds(self, images: torch.Tensor, masks: torch.Tensor) -> torch.Tensor:
+        batch_size = images.shape[0]
+        swap = torch.rand(batch_size, device=self.device, generator=self.generator) < self.background_prob
+        picks = torch.randint(len(self.backgrounds), (batch_size,), device=self.device, generator=self.generator)
+        backgrounds = self.backgrounds[picks]
+        if backgrounds.shape[-2:] != images.shape[-2:]:
+            backgrounds = F.interpolate(backgrounds, size=images.shape[-2:], mode='bilinear', align_corners=False)
+        swapped = composite_batch(backgrounds, images, masks)
+        return torch.where(swap.view(-1, 1, 1, 1), swapped, images)
+
+    def _jitter(self, images: torch.Tensor) -> torch.Tensor:
+        batch_size = images.shape[0]
+        brightness = self._uniform(batch_size, 1 - self.brightness, 1 + self.brightness).view(-1, 1, 1, 1)
+        contrast = self._uniform(batch_size, 1 - self.contrast, 1 + self.contrast).view(-1, 1, 1, 1)
+        saturation = self._uniform(batch_size, 1 - self.saturation, 1 + self.saturation).view(-1, 1, 1, 1)
+
+        images = (images * brightness).clamp(0, 1)
+        mean = (images * self.luma).sum(dim=1, keepdim=True).mean(dim=(2, 3), keepdim=True)
+        images = ((images - mean) * contrast + mean).clamp(0, 1)
+        gray = (images * self.luma).sum(dim=1, keepdim=True)
+        return ((images - gray) * saturation + gray).clamp(0, 1)
+
+    @torch.no_grad()
+    def __call__(self, images: torch.Tensor, masks: torch.Tensor):
+        """
+        Augments a batch.
+
+        Args:
+            images: (B, 3, H, W) images in [0, 1] on the augmentation device.
+            masks: (B, 1, H, W) masks in [0, 1].
+
+        Returns:
+            The augmented (images, masks).
+        """
+        images, masks = self._geometry(images.float(), masks.float())
+        if self.backgrounds is not None:
+            images = self._swap_backgrounds(images, masks)
+        return self._jitter(images), masks
@@ -0,0 +1,214 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+from PIL import Image, ImageDraw
+from torch.utils.data import DataLoader
+from torchvision import transforms
+from src.create_masks import create_mask
+from src.data_loader import LogoDataset, load_data, seed_worker
+from src.image_utils import composite_images, crop_background, preprocess_image
+from src.inference import ARCHITECTURES
+
+def time_call(fn, repeat: int, warmup: int = 1) -> dict:
+    """
+    Times repeated calls of `fn`.
+
+    Returns:
+        A dict with the median, minimum and maximum seconds per call and the number of timed calls.
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {
+        "median_s": statistics.median(times),
+        "min_s": min(times),
+        "max_s": max(times),
+        "runs": repeat,
+    }
+
+def make_dataset(root: str, count: int, size=(800, 600), seed: int = 0) -> dict:
+    """
+    Generates a reproducible synthetic dataset of transparent logos,
+    composited images, masks and backgrounds under `root`.
+
+    Returns:
+        A dict with the paths of the "transparent", "images", "masks" and "backgrounds" directories.
+    """
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    dirs = {name: os.path.join(root, name) for name in ("transparent", "images", "masks", "backgrounds")}
+    for directory in dirs.values():
+        os.makedirs(directory, exist_ok=True)
+
+    width, height = size
+    for i in range(count):
+        logo = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(logo)
+        for _ in range(5):
+            x0, y0 = rng.randrange(width // 2), rng.randrange(height // 2)
+            box = (x0, y0, x0 + rng.randrange(20, width // 2), y0 + rng.randrange(20, height // 2))
+            draw.ellipse(box, fill=(rng.randrange(256), rng.randrange(256), rng.randrange(256), 255))
+        name = f"logo_{i:04d}.png"
+        logo.save(os.path.join(dirs["transparent"], name))
+
+        background = Image.fromarray(noise.integers(0, 256, (height * 2, width * 2, 3), dtype=np.uint8))
+        background.save(os.path.join(dirs["backgrounds"], f"bg_{i:04d}.jpg"), quality=90)
+        composite_images(crop_background(background, width, height, rng), logo).save(os.path.join(dirs["images"], name))
+        logo.getchannel('A').save(os.path.join(dirs["masks"], name))
+
+    return dirs
+
+def data_benchmarks(dirs: dict, repeat: int):
+    """Yields (name, result) for the image processing and data loading hot paths."""
+    logos = sorted(os.listdir(dirs["transparent"]))
+    image_path = os.path.join(dirs["images"], logos[0])
+    logo_path = os.path.join(dirs["transparent"], logos[0])
+    logo = Image.open(logo_path)
+    logo.load()
+    background = Image.open(os.path.join(dirs["backgrounds"], "bg_0000.jpg"))
+    background.load()
+    rng = random.Random(0)
+
+    yield "preprocess_image", time_call(lambda: preprocess_image(image_path), repeat)
+    jpeg_path = os.path.join(dirs["backgrounds"], "bg_0000.jpg")
+    yield "preprocess_image_jpeg", time_call(lambda: preprocess_image(jpeg_path), repeat)
+    yield "preprocess_image_jpeg_draft", time_call(lambda: preprocess_image(jpeg_path, draft=True), repeat)
+    if importlib.util.find_spec("cv2") is not None:
+        yield "preprocess_image_jpeg_draft_opencv", time_call(
+            lambda: preprocess_image(jpeg_path, draft=True, resize_backend="opencv"), repeat)
+    yield "crop_background+composite_images", time_call(
+        lambda: composite_images(crop_background(background, logo.width, logo.height, rng), logo), repeat)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        mask_path = os.path.join(tmp_dir, "mask.png")
+        yield "create_mask", time_call(lambda: create_mask(logo_path, mask_path, force=True), repeat)
+
+    yield "load_data_lazy", time_call(lambda: load_data(dirs["images"], dirs["masks"], lazy=True), repeat)
+    yield "load_data_eager", time_call(lambda: load_data(dirs["images"], dirs["masks"]), max(1, repeat // 5))
+
+    transform = transforms.Compose([transforms.Resize((320, 320)), transforms.ToTensor()])
+    X_train, _, y_train, _ = load_data(dirs["images"], dirs["masks"], lazy=True)
+    dataset = LogoDataset(X_train, y_train, transform=transform)
+    for workers in (0, 2):
+        loader = DataLoader(dataset, batch_size=4, num_workers=workers, worker_init_fn=seed_worker if workers else None)
+        result = time_call(lambda: sum(1 for _ in loader), max(1, repeat // 5))
+        result["samples_per_sec"] = len(dataset) / result["median_s"]
+        yield f"dataloader_workers{workers}", result
+
+def model_benchmarks(archs, batch_sizes, size: int, repeat: int):
+    """Yields (name, result) for forward and forward+backward passes on CPU."""
+    for arch in archs:
+        torch.manual_seed(0)
+        model = ARCHITECTURES[arch]()
+        for batch_size in batch_sizes:
+            x = torch.rand(batch_size, 3, size, size)
+            target = (torch.rand(batch_size, 1, size, size) > 0.5).float()
+
+            model.eval()
+            with torch.no_grad():
+                result = time_call(lambda: model(x), repeat)
+            result["samples_per_sec"] = batch_size / result["median_s"]
+            yield f"{arch}_forward_b{batch_size}", result
+
+            model.train()
+            criterion = torch.nn.BCEWithLogitsLoss()
+
+            def train_step():
+                model.zero_grad(set_to_none=True)
+                criterion(model(x)[0], target).backward()
+
+            result = time_call(train_step, repeat)
+            result["samples_per_sec"] = batch_size / result["median_s"]
+            yield f"{arch}_forward_backward_b{batch_size}", result
+
+def compare(results: dict, baseline: dict) -> list:
+    """
+    Compares median times against a baseline.
+
+    Returns:
+        A list of (name, baseline seconds, current seconds, ratio) for every
+        benchmark present in both, sorted by name.
+    """
+    rows = []
+    for name in sorted(set(results) & set(baseline)):
+        before, after = baseline[name]["median_s"], results[name]["median_s"]
+        rows.append((name, before, after, after / before))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline and model hot paths on a generated dataset.")
+    parser.add_argument("--output", type=str, default="benchmark_results.json", help="Path to write the results to.")
+    parser.add_argument("--baseline", type=str, default=None, help="Results of an earlier run to compare against.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Slowdown relative to the baseline that counts as a regression (0.2 = 20%%).")
+    parser.add_argument("--images", type=int, default=32, help="Number of generated images.")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed repetitions of each fast benchmark.")
+    parser.add_argument("--archs", type=str, nargs="*", choices=list(ARCHITECTURES), default=list(ARCHITECTURES), help="Model architectures to benchmark.")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 4], help="Batch sizes of the model benchmarks.")
+    parser.add_argument("--size", type=int, default=320, help="Input height and width of the model benchmarks.")
+    parser.add_argument("--model_repeat", type=int, default=3, help="Timed repetitions of each model benchmark.")
+    parser.add_argument("--threads", type=int, default=None, help="Number of torch intra-op threads. Fixing it makes runs comparable across machines.")
+    parser.add_argument("--filter", type=str, default=None, help="Only keep results whose name contains this string. Use --archs with no value to skip the model benchmarks.")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+
+    results = {}
+
+    def record(name, result):
+        if args.filter and args.filter not in name:
+            return
+        results[name] = result
+        print(f"{name:40} {result['median_s'] * 1000:10.2f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        dirs = make_dataset(tmp_dir, args.images)
+        for name, result in data_benchmarks(dirs, args.repeat):
+            record(name, result)
+    for name, result in model_benchmarks(args.archs, args.batch_sizes, args.size, args.model_repeat):
+        record(name, result)
+
+    output = {
+        "meta": {
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "threads": torch.get_num_threads(),
+            "images": args.images,
+            "size": args.size,
+        },
+        "results": results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = 0
+        print(f"\n{'benchmark':40} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for name, before, after, ratio in compare(results, baseline):
+            regressed = ratio > 1 + args.threshold
+            regressions += regressed
+            print(f"{name:40} {before * 1000:8.2f}ms {after * 1000:8.2f}ms {ratio:6.2f}x{'  REGRESSION' if regressed else ''}")
+        if regressions:
+            print(f"{regressions} benchmark(s) slower than the baseline by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import random
+import numpy as np
+import torch
+from pathlib import Path
+
+CHECKPOINT_PREFIX = "checkpoint_epoch"
+BEST_MODEL_FILE = "best_model.pth"
+
+def capture_rng_state() -> dict:
+    """Returns the state of every random number generator used during training."""
+    state = {
+        "python": random.getstate(),
+        "numpy": np.random.get_state(),
+        "torch": torch.get_rng_state(),
+    }
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+def restore_rng_state(state: dict) -> None:
+    """Restores random number generator states captured by `capture_rng_state`."""
+    random.setstate(state["python"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+def seed_rng(seed: int) -> None:
+    """Seeds the Python, NumPy and torch (CPU and CUDA) random number generators."""
+    random.seed(seed)
+    np.random.seed(seed % 2**32)
+    torch.manual_seed(seed)
+
+def rank_state(saved, rank: int, world_size: int):
+    """
+    Picks this process's entry from states saved per rank in a checkpoint.
+
+    Checkpoints hold a list with one state per rank. A single state, as
+    written before states were saved per rank, counts as a one-process list.
+
+    Returns:
+        The state of `rank`, or None if nothing was saved or the checkpoint
+        was written by a different number of processes, in which case the
+        caller should reseed instead.
+    """
+    if saved is None:
+        return None
+    if isinstance(saved, dict):
+        saved = [saved]
+    return saved[rank] if len(saved) == world_size else None
+
+def atomic_save(obj, path) -> None:
+    """
+    Saves an object with `torch.save` so that `path` is never left half-written.
+
+    The data goes to a temporary file in the same directory first, which is
+    then renamed over `path`. A crash during the write leaves the previous
+    file untouched.
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, 'wb') as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class CheckpointManager:
+    """
+    Writes periodic training checkpoints to a directory and keeps only the most recent ones.
+
+    Checkpoints are named `checkpoint_epochNNNN.pth` after the number of
+    completed epochs. The best model seen so far is kept separately as a
+    plain `state_dict` in `best_model.pth`, so it can be loaded like the
+    final model file.
+    """
+    def __init__(self, checkpoint_dir, keep_last: int = 3):
+        if keep_last < 1:
+            raise ValueError(f"keep_last must be at least 1, got {keep_last}.")
+        self.checkpoint_dir = Path(checkpoint_dir)
+        self.keep_last = keep_last
+        self.checkpoint_dir.mkdir(parents=True, exist_ok=True)
+
+    def checkpoints(self) -> list:
+        """Returns the existing checkpoint paths, oldest first."""
+        return sorted(self.checkpoint_dir.glob(f"{CHECKPOINT_PREFIX}*.pth"))
+
+    def latest(self):
+        """Returns the most recent checkpoint path, or None if there is none."""
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if checkpoints else None
+
+    def save(self, epoch: int, state: dict) -> Path:
+        """
+        Saves a checkpoint for the given number of completed epochs and removes the oldest
+        ones beyond `keep_last`.
+        """
+        path = self.checkpoint_dir / f"{CHECKPOINT_PREFIX}{epoch:04d}.pth"
+        atomic_save(state, path)
+
+        for old_path in self.checkpoints()[:-self.keep_last]:
+            old_path.unlink()
+        return path
+
+    def save_best(self, state_dict: dict) -> Path:
+        path = self.checkpoint_dir / BEST_MODEL_FILE
+        atomic_save(state_dict, path)
+        return path
+
+    @staticmethod
+    def load(path, map_location=None) -> dict:
+        return torch.load(path, map_location=map_location, weights_only=False)
@@ -0,0 +1,273 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import numpy as np
+from PIL import Image
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mask_path TEXT,
+    mtime_ns INTEGER NOT NULL,
+    mask_mtime_ns INTEGER,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    dhash TEXT,
+    width INTEGER,
+    height INTEGER,
+    mode TEXT,
+    alpha_mean REAL,
+    mask_coverage REAL,
+    error TEXT
+)
+"""
+
+META_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+)
+"""
+
+DEFAULT_MAX_DISTANCE = 4
+
+COLUMNS = ("path", "mask_path", "mtime_ns", "mask_mtime_ns", "size", "sha256", "dhash", "width", "height",
+           "mode", "alpha_mean", "mask_coverage", "error")
+
+def dhash(image: Image.Image, hash_size: int = 8) -> int:
+    """
+    Computes the difference hash of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale
+    thumbnail, and each bit records whether a pixel is brighter than its
+    right neighbour. Re-encoded, resized or slightly recolored copies of an
+    image have hashes a few bits apart.
+
+    Returns:
+        The hash as a hash_size * hash_size bit integer.
+    """
+    pixels = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def describe_file(image_path: str, mask_path: str = None) -> dict:
+    """
+    Hashes and inspects one image and its mask.
+
+    Returns:
+        A row for the `files` table. Unreadable images get their error
+        message in "error" and no image statistics.
+    """
+    stat = os.stat(image_path)
+    with open(image_path, 'rb') as f:
+        data = f.read()
+    record = dict.fromkeys(COLUMNS)
+    record.update(path=image_path, mask_path=mask_path, mtime_ns=stat.st_mtime_ns, size=stat.st_size,
+                  sha256=hashlib.sha256(data).hexdigest())
+
+    try:
+        with Image.open(image_path) as image:
+            image.load()
+            record.update(width=image.width, height=image.height, mode=image.mode,
+                          dhash=f"{dhash(image):016x}")
+            if "A" in image.getbands():
+                record["alpha_mean"] = float(np.asarray(image.getchannel("A")).mean() / 255)
+
+        if mask_path is not None:
+            record["mask_mtime_ns"] = os.stat(mask_path).st_mtime_ns
+            with Image.open(mask_path) as mask:
+                record["mask_coverage"] = float((np.asarray(mask.convert("L")) > 127).mean())
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+
+    return record
+
+def _describe_pair(pair):
+    return describe_file(*pair)
+
+class _DisjointSet:
+    def __init__(self, items):
+        self.parent = {item: item for item in items}
+
+    def find(self, item):
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+class CorpusIndex:
+    """
+    SQLite manifest of a training corpus with content and perceptual hashes.
+
+    Every image is stored with its mask, modification times, SHA-256,
+    difference hash, dimensions, mode, mean alpha and mask coverage, so
+    `load_data` can build its splits from the manifest without scanning or
+    opening the files. `update` only re-hashes files whose modification
+    time changed.
+    """
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self.connection = sqlite3.connect(self.db_path)
+        self.connection.execute(SCHEMA)
+        self.connection.execute(META_SCHEMA)
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def meta(self, key: str, default=None):
+        """Returns a setting stored in the manifest, or `default` if it was never set."""
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else default
+
+    def set_meta(self, key: str, value) -> None:
+        """Stores a setting in the manifest, e.g. the "max_distance" used by `groups`."""
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+    def update(self, input_dir, mask_dir, workers: int = None) -> dict:
+        """
+        Brings the manifest in line with the images in `input_dir`.
+
+        Images are paired with the mask of the same name in `mask_dir`, as in
+        `load_data`. New and modified files are hashed in a process pool,
+        rows of deleted files are removed.
+
+        Returns:
+            A dict with the number of "indexed", "unchanged" and "removed" images.
+        """
+        known = {row[0]: row[1:] for row in self.connection.execute("SELECT path, mtime_ns, mask_path, mask_mtime_ns FROM files")}
+
+        pending = []
+        present = set()
+        for image_path in sorted(Path(input_dir).glob("*.png")):
+            path = os.path.abspath(image_path)
+            mask_path = os.path.abspath(Path(mask_dir) / image_path.name)
+            if not os.path.exists(mask_path):
+                mask_path = None
+            present.add(path)
+
+            row = known.get(path)
+            mask_mtime = os.stat(mask_path).st_mtime_ns if mask_path else None
+            if row is None or row != (os.stat(path).st_mtime_ns, mask_path, mask_mtime):
+                pending.append((path, mask_path))
+
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(pending) < 2:
+            records = list(map(_describe_pair, pending))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                records = list(executor.map(_describe_pair, pending, chunksize=max(1, len(pending) // (4 * workers))))
+
+        removed = [(path,) for path in known if path not in present]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                [tuple(record[c] for c in COLUMNS) for record in records])
+            self.connection.executemany("DELETE FROM files WHERE path = ?", removed)
+
+        return {"indexed": len(records), "unchanged": len(present) - len(records), "removed": len(removed)}
+
+    def records(self, usable_only: bool = True) -> list:
+        """
+        Returns the rows of the manifest as dicts, sorted by path.
+
+        With `usable_only`, images that could not be decoded or have no mask are left out.
+        """
+        query = f"SELECT {', '.join(COLUMNS)} FROM files"
+        if usable_only:
+            query += " WHERE error IS NULL AND mask_path IS NOT NULL"
+        return [dict(zip(COLUMNS, row)) for row in self.connection.execute(query + " ORDER BY path")]
+
+    def groups(self, records: list = None, max_distance: int = None) -> list:
+        """
+        Assigns each record a group id, such that exact duplicates (same SHA-256)
+        and near-duplicates (difference hashes at most `max_distance` bits
+        apart) share a group. `max_distance` defaults to the value stored in
+        the manifest with `set_meta`, or 4.
+
+        Candidate pairs are found by splitting the 64-bit hashes into
+        `max_distance + 1` bands: two hashes within `max_distance` bits agree
+        completely on at least one band, so only hashes sharing a band are
+        compared.
+
+        Returns:
+            A list of group ids, one per record.
+        """
+        records = self.records() if records is None else records
+        if max_distance is None:
+            max_distance = int(self.meta("max_distance", DEFAULT_MAX_DISTANCE))
+        paths = [r["path"] for r in records]
+        groups = _DisjointSet(paths)
+
+        representatives = {}
+        for key in ("sha256", "dhash"):
+            same = {}
+            for r in records:
+                if r[key]:
+                    same.setdefault(r[key], []).append(r["path"])
+            for members in same.values():
+                for other in members[1:]:
+                    groups.union(members[0], other)
+            if key == "dhash":
+                # Near-duplicates only need to be searched among distinct hashes
+                representatives = {int(value, 16): members[0] for value, members in same.items()}
+
+        bands = max_distance + 1
+        width = -(-64 // bands)
+        buckets = {}
+        for value in representatives:
+            for band in range(bands):
+                buckets.setdefault((band, (value >> (band * width)) & ((1 << width) - 1)), []).append(value)
+
+        for members in buckets.values():
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if bin(a ^ b).count("1") <= max_distance:
+                        groups.union(representatives[a], representatives[b])
+
+        roots = {}
+        return [roots.setdefault(groups.find(path), len(roots)) for path in paths]
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a training corpus with content and perceptual hashes.")
+    parser.add_argument("--input_dir", type=str, required=True, help="Path to the directory of training images.")
+    parser.add_argument("--mask_dir", type=str, required=True, help="Path to the directory of mask images.")
+    parser.add_argument("--manifest", type=str, required=True, help="SQLite file to create or update.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes. Defaults to one per core.")
+    parser.add_argument("--max_distance", type=int, default=None, help="Difference hashes at most this many bits apart count as near-duplicates. "
+                        "Stored in the manifest, so load_data groups the same way; defaults to the stored value or 4.")
+    args = parser.parse_args()
+    if args.max_distance is not None and args.max_distance < 0:
+        parser.error("--max_distance must be at least 0.")
+
+    start = time.perf_counter()
+    with CorpusIndex(args.manifest) as index:
+        counts = index.update(args.input_dir, args.mask_dir, args.workers)
+        if args.max_distance is not None:
+            index.set_meta("max_distance", args.max_distance)
+        records = index.records(usable_only=False)
+        usable = index.records()
+        groups = index.groups(usable)
+
+    corrupt = sum(1 for r in records if r["error"])
+    unmatched = sum(1 for r in records if r["mask_path"] is None)
+    print(f"Indexed {counts['indexed']} images ({counts['unchanged']} unchanged, {counts['removed']} removed) "
+          f"in {time.perf_counter() - start:.1f}s.")
+    print(f"{len(records)} images: {corrupt} unreadable, {unmatched} without mask, "
+          f"{len(usable)} usable in {len(set(groups))} duplicate groups.")
+
+if __name__ == "__main__":
+    main()
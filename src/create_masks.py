@@ -1,22 +1,77 @@
 
 import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
+from PIL.PngImagePlugin import PngInfo
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def create_masks() -> None:
+def alpha_to_mask(alpha: Image.Image, threshold: int = 0) -> Image.Image:
+    """
+    Converts an alpha channel to a binary mask.
+
+    Uses a 256-entry lookup table, so the thresholding runs in Pillow's C code
+    instead of calling a Python function per pixel value.
+
+    Args:
+        alpha: The alpha channel as an 'L' image.
+        threshold: Alpha values above this become 255, all others 0.
+
+    Returns:
+        The binary mask as an 'L' image.
+    """
+    table = [255 if p > threshold else 0 for p in range(256)]
+    return alpha.point(table, 'L')
+
+def _is_up_to_date(image_path: str, mask_path: str, threshold: int) -> bool:
+    if not os.path.exists(mask_path) or os.path.getmtime(mask_path) < os.path.getmtime(image_path):
+        return False
+    # Masks record the threshold they were made with; only the header is read
+    try:
+        with Image.open(mask_path) as mask:
+            return mask.info.get("threshold") == str(threshold)
+    except Exception:
+        return False
+
+def create_mask(image_path: str, mask_path: str, threshold: int = 0, force: bool = False) -> str:
+    """
+    Creates the mask for a single transparent image.
+
+    Returns:
+        "created", "skipped" if the mask is already newer than the image and
+        was made with the same threshold, "not_rgba" if the image has no
+        alpha channel, or an error message.
+    """
+    if not force and _is_up_to_date(image_path, mask_path, threshold):
+        return "skipped"
+
+    try:
+        with Image.open(image_path) as img:
+            if img.mode != 'RGBA':
+                return "not_rgba"
+            metadata = PngInfo()
+            metadata.add_text("threshold", str(threshold))
+            alpha_to_mask(img.getchannel('A'), threshold).save(mask_path, pnginfo=metadata)
+        return "created"
+    except Exception as e:
+        return f"Error processing {os.path.basename(image_path)}: {e}"
+
+def create_masks(transparent_dir: str = 'data/transparent', masks_dir: str = 'data/masks',
+                 threshold: int = 0, workers: int = None, force: bool = False) -> None:
     """
     Generates black and white masks from the alpha channel of transparent images.
 
     This script reads transparent PNG images from `data/transparent`,
     extracts their alpha channel, converts it to a grayscale image,
-    and saves the resulting mask to `data/masks`.
+    and saves the resulting mask to `data/masks`. Images are spread
+    over a pool of worker processes, and masks that are already newer
+    than their source image and were made with the same threshold are
+    skipped unless `force` is set.
     """
-    transparent_dir = 'data/transparent'
-    masks_dir = 'data/masks'
-
     if not os.path.exists(masks_dir):
         os.makedirs(masks_dir)
         logging.info(f"Created directory: {masks_dir}")
@@ -29,26 +84,44 @@ def create_masks() -> None:
 
     logging.info(f"Found {len(transparent_images)} transparent images to process.")
 
-    for image_name in transparent_images:
-        try:
-            image_path = os.path.join(transparent_dir, image_name)
-            with Image.open(image_path) as img:
-                if img.mode == 'RGBA':
-                    # Get the alpha channel
-                    alpha = img.getchannel('A')
-                    
-                    # Convert alpha channel to a binary mask
-                    mask = alpha.point(lambda p: 255 if p > 0 else 0, 'L')
-                    
-                    # Save the mask
-                    mask_path = os.path.join(masks_dir, image_name)
-                    mask.save(mask_path)
-                    logging.info(f"Successfully created mask for {image_name}")
-                else:
-                    logging.warning(f"Image {image_name} is not in RGBA mode and will be skipped.")
-
-        except Exception as e:
-            logging.error(f"Error processing {image_name}: {e}")
+    image_paths = [os.path.join(transparent_dir, name) for name in transparent_images]
+    mask_paths = [os.path.join(masks_dir, name) for name in transparent_images]
+    count = len(transparent_images)
+    start = time.perf_counter()
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(create_mask, image_paths, mask_paths, [threshold] * count, [force] * count))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(create_mask, image_paths, mask_paths, [threshold] * count,
+                                        [force] * count, chunksize=max(1, count // (4 * workers))))
+
+    summary = {"created": 0, "skipped": 0, "not_rgba": 0, "failed": 0}
+    for image_name, result in zip(transparent_images, results):
+        if result == "not_rgba":
+            logging.warning(f"Image {image_name} is not in RGBA mode and will be skipped.")
+            summary["not_rgba"] += 1
+        elif result in summary:
+            summary[result] += 1
+        else:
+            logging.error(result)
+            summary["failed"] += 1
+
+    elapsed = time.perf_counter() - start
+    logging.info(
+        f"Created {summary['created']} masks, skipped {summary['skipped']} up-to-date, "
+        f"{summary['not_rgba']} without alpha, {summary['failed']} failed "
+        f"in {elapsed:.1f}s ({count / max(elapsed, 1e-9):.1f} images/s)."
+    )
 
 if __name__ == "__main__":
-    create_masks()
+    parser = argparse.ArgumentParser(description="Create binary masks from the alpha channel of transparent images.")
+    parser.add_argument("--transparent_dir", type=str, default='data/transparent', help="Directory of transparent PNG images.")
+    parser.add_argument("--masks_dir", type=str, default='data/masks', help="Directory to write the masks to.")
+    parser.add_argument("--threshold", type=int, default=0, help="Alpha values above this are treated as foreground.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes. Defaults to one per core.")
+    parser.add_argument("--force", action="store_true", help="Recreate masks even if they are up to date.")
+    args = parser.parse_args()
+
+    create_masks(args.transparent_dir, args.masks_dir, args.threshold, args.workers, args.force)
@@ -1,21 +1,58 @@
+import math
+import os
+import random
+import numpy as np
+import torch
 from PIL import Image
-from pathlib import Path
-from sklearn.model_selection import train_test_split
-from torch.utils.data import Dataset
-from src.image_utils import preprocess_image
+from pathlib import Path, PurePosixPath
+from sklearn.model_selection import GroupShuffleSplit, train_test_split
+from functools import lru_cache
+from torch.utils.data import Dataset, Sampler
+from src.create_masks import alpha_to_mask
+from src.image_utils import closest_bucket, composite_images, crop_background, preprocess_image
 
 class LogoDataset(Dataset):
-    def __init__(self, images, masks, transform=None):
+    """
+    Pairs of logo images and masks.
+
+    `images` and `masks` may either hold already-loaded Pillow images
+    (eager mode) or file paths (lazy mode). In lazy mode only the paths
+    are kept in memory and each pair is decoded and preprocessed inside
+    `__getitem__`, so memory use does not grow with the dataset size.
+
+    When a `TensorCache` is given, `images` must be paths and each pair is
+    read from the cache shards instead. Samples are then returned as float
+    tensors in [0, 1] (the same layout `ToTensor` produces), so `transform`
+    must operate on tensors.
+
+    When a `ZipArchive` is given, the paths are member names inside it and
+    are read from the archive without extracting it.
+
+    When `buckets` is given (see `image_utils.aspect_buckets`), every sample
+    is assigned the bucket closest to its aspect ratio, read from the image
+    header, and image and mask are resized straight to that bucket instead
+    of to 320x320, so `transform` must not resize again. Batch with a
+    `BucketBatchSampler` over `sample_buckets` so every batch has one shape.
+    Buckets need paths, i.e. lazy mode without a cache.
+    """
+    def __init__(self, images, masks, transform=None, cache=None, archive=None, buckets=None):
         self.images = images
         self.masks = masks
         self.transform = transform
+        self.cache = cache
+        self.archive = archive
+        self.buckets = buckets
+        self.sample_buckets = None
+        if buckets is not None:
+            if cache is not None or not all(isinstance(p, (str, os.PathLike)) for p in images):
+                raise ValueError("Aspect buckets require image paths (lazy loading without a cache).")
+            self.sample_buckets = [closest_bucket(*_image_size(p, archive), buckets) for p in images]
 
     def __len__(self):
         return len(self.images)
 
     def __getitem__(self, idx):
-        image = self.images[idx] # Already preprocessed
-        mask = self.masks[idx].convert("L")
+        image, mask = self._load_pair(idx)
 
         if self.transform:
             image = self.transform(image)
@@ -23,38 +60,346 @@ class LogoDataset(Dataset):
 
         return image, mask
 
-def load_data(input_dir, mask_dir):
+    def _load_pair(self, idx):
+        image = self.images[idx]
+        mask = self.masks[idx]
+
+        if not isinstance(image, (str, os.PathLike)):
+            return image, mask.convert("L") # Already preprocessed
+
+        if self.cache is not None:
+            return self._load_cached(idx)
+
+        # Lazy mode: corrupted images are only discovered here, so fall
+        # through to the next sample instead of handing None to the collate.
+        # A fallback sample is resized to the bucket of `idx`, which its batch was built for.
+        size = self.sample_buckets[idx] if self.sample_buckets is not None else (320, 320)
+        for offset in range(len(self.images)):
+            i = (idx + offset) % len(self.images)
+            image = preprocess_image(_open_source(self.images[i], self.archive), size=size)
+            if image is not None:
+                mask = _read_mask(_open_source(self.masks[i], self.archive))
+                if self.sample_buckets is not None:
+                    mask = mask.resize(size, Image.Resampling.BILINEAR)
+                return image, mask
+
+        raise RuntimeError("No readable images found in the dataset.")
+
+    def _load_cached(self, idx):
+        # Corrupted images are never cached, so skip them like lazy mode does
+        for offset in range(len(self.images)):
+            i = (idx + offset) % len(self.images)
+            if self.images[i] in self.cache:
+                image, mask = self.cache.get(self.images[i])
+                image = torch.from_numpy(np.ascontiguousarray(image.transpose(2, 0, 1), dtype=np.float32) / 255)
+                mask = torch.from_numpy(mask.astype(np.float32) / 255).unsqueeze(0)
+                return image, mask
+
+        raise RuntimeError("No cached images found in the dataset.")
+
+class SyntheticLogoDataset(Dataset):
+    """
+    Composites of transparent logos on random backgrounds, generated on demand.
+
+    Each sample pastes a logo onto a random crop of a random background,
+    the same way `main.py` does, and derives the mask from the logo's alpha
+    channel in the same pass, the same way `create_masks.py` does. Nothing
+    is written to disk, and since the background and crop are drawn anew on
+    every access, each epoch sees fresh composites.
+
+    Decoded logos and backgrounds are kept in bounded per-process LRU caches.
+    Images are resized to 320x320 like `preprocess_image`; masks are returned
+    at logo size as 'L' images, so `transform` should resize both, like it
+    does for a lazy `LogoDataset`. Logos without an alpha channel are skipped.
+
+    Args:
+        transparent_dir: Directory of transparent PNG logos.
+        bg_dir: Directory of background images.
+        length: Samples per epoch. Defaults to one per logo; larger values
+            cycle through the logos with different backgrounds.
+        transform: Applied to both image and mask.
+        seed: If None, draws come from the `random` module, which
+            `seed_worker` seeds per DataLoader worker, so samples differ per
+            epoch. If given, every index always yields the same sample.
+        threshold: Alpha values above this count as foreground, see `alpha_to_mask`.
+        logo_cache_size: Maximum number of decoded logos kept per process.
+        bg_cache_size: Maximum number of decoded backgrounds kept per process.
+    """
+    def __init__(self, transparent_dir, bg_dir, length=None, transform=None, seed=None, threshold=0,
+                 logo_cache_size=256, bg_cache_size=32):
+        self.logos = sorted(p for p in Path(transparent_dir).glob("*.png"))
+        self.backgrounds = sorted(p for p in Path(bg_dir).iterdir() if p.suffix.lower() in (".png", ".jpg", ".jpeg"))
+        if not self.logos or not self.backgrounds:
+            raise ValueError(f"Need at least one logo in {transparent_dir} and one background in {bg_dir}.")
+        self.length = length or len(self.logos)
+        self.transform = transform
+        self.seed = seed
+        self.threshold = threshold
+        self.logo_cache_size = logo_cache_size
+        self.bg_cache_size = bg_cache_size
+        self._loaders = None
+
+    def __len__(self):
+        return self.length
+
+    def __getstate__(self):
+        # Caches are built lazily in each DataLoader worker
+        state = self.__dict__.copy()
+        state["_loaders"] = None
+        return state
+
+    def _get_loaders(self):
+        if self._loaders is None:
+            self._loaders = (
+                lru_cache(maxsize=self.logo_cache_size)(_read_logo),
+                lru_cache(maxsize=self.bg_cache_size)(_read_background),
+            )
+        return self._loaders
+
+    def __getitem__(self, idx):
+        image, mask = self._composite(idx)
+
+        if self.transform:
+            image = self.transform(image)
+            mask = self.transform(mask)
+
+        return image, mask
+
+    def _composite(self, idx):
+        load_logo, load_background = self._get_loaders()
+        rng = random.Random(f"{self.seed}:{idx}") if self.seed is not None else random
+
+        for offset in range(len(self.logos)):
+            logo = load_logo(self.logos[(idx + offset) % len(self.logos)])
+            if logo is None:
+                continue
+
+            background = load_background(rng.choice(self.backgrounds))
+            if background.width < logo.width or background.height < logo.height:
+                scale = max(logo.width / background.width, logo.height / background.height)
+                background = background.resize((math.ceil(background.width * scale), math.ceil(background.height * scale)),
+                                               Image.Resampling.BILINEAR)
+
+            image = composite_images(crop_background(background, logo.width, logo.height, rng), logo)
+            mask = alpha_to_mask(logo.getchannel('A'), self.threshold)
+            return image.resize((320, 320), Image.Resampling.LANCZOS), mask
+
+        raise RuntimeError("No transparent logos with an alpha channel found.")
+
+def _read_logo(path):
+    try:
+        with Image.open(path) as logo:
+            if logo.mode != 'RGBA':
+                return None
+            return logo.copy()
+    except (Image.UnidentifiedImageError, OSError):
+        print(f"Warning: Corrupted image detected and skipped: {path}")
+        return None
+
+def _read_background(path):
+    with Image.open(path) as background:
+        return background.convert('RGB')
+
+class BucketBatchSampler(Sampler):
+    """
+    Yields batches of sample indices in which all samples share an aspect bucket.
+
+    Samples are grouped by bucket, each group is cut into batches, and the
+    batches of all buckets are then interleaved in random order, so every
+    batch is a dense tensor of one shape without padding. The shuffle is
+    drawn from `seed` and the epoch set with `set_epoch`, like
+    `DistributedSampler`.
+
+    With `num_replicas` > 1 every process takes every `num_replicas`-th
+    batch of the shared order. The batch list is first trimmed to a
+    multiple of `num_replicas`, so all processes run the same number of
+    steps.
+
+    Args:
+        sample_buckets: The bucket of every sample, e.g. `LogoDataset.sample_buckets`.
+        batch_size: Maximum samples per batch.
+        shuffle: Shuffle samples within buckets and the order of batches every epoch.
+        seed: Seed of the shuffle.
+        drop_last: Drop the last, incomplete batch of every bucket.
+        num_replicas: Number of processes sharing the batches.
+        rank: Index of this process.
+    """
+    def __init__(self, sample_buckets, batch_size, shuffle=True, seed=0, drop_last=False, num_replicas=1, rank=0):
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.drop_last = drop_last
+        self.num_replicas = num_replicas
+        self.rank = rank
+        self.epoch = 0
+        self.groups = {}
+        for idx, bucket in enumerate(sample_buckets):
+            self.groups.setdefault(tuple(bucket), []).append(idx)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def _batches(self):
+        rng = random.Random(self.seed + self.epoch)
+        batches = []
+        for bucket in sorted(self.groups):
+            indices = list(self.groups[bucket])
+            if self.shuffle:
+                rng.shuffle(indices)
+            for start in range(0, len(indices), self.batch_size):
+                batch = indices[start:start + self.batch_size]
+                if len(batch) == self.batch_size or not self.drop_last:
+                    batches.append(batch)
+        if self.shuffle:
+            rng.shuffle(batches)
+        usable = len(batches) - len(batches) % self.num_replicas
+        return batches[self.rank:usable:self.num_replicas]
+
+    def __iter__(self):
+        return iter(self._batches())
+
+    def __len__(self):
+        batches = 0
+        for indices in self.groups.values():
+            batches += len(indices) // self.batch_size if self.drop_last else math.ceil(len(indices) / self.batch_size)
+        return batches // self.num_replicas
+
+def _image_size(path, archive=None):
+    # Only the header is read; unreadable images get the square bucket and are skipped when loaded
+    try:
+        with Image.open(_open_source(path, archive)) as image:
+            return image.size
+    except (Image.UnidentifiedImageError, OSError):
+        return (1, 1)
+
+def _open_source(path, archive=None):
+    return archive.open(path) if archive is not None else path
+
+def _read_mask(mask_path):
+    # Decode fully so no file handle stays open (and shared with workers)
+    with Image.open(mask_path) as mask:
+        return mask.convert("L")
+
+def seed_worker(worker_id):
+    """
+    Seeds the Python and NumPy RNGs of a DataLoader worker.
+
+    PyTorch gives every worker its own torch seed but leaves the `random` and
+    NumPy generators as copies of the parent's state, so without this each
+    worker would produce identical random augmentations.
+    """
+    seed = torch.initial_seed() % 2**32
+    np.random.seed(seed)
+    random.seed(seed)
+
+def _list_archive_pngs(archive, directory):
+    return sorted(
+        PurePosixPath(name) for name in archive.namelist()
+        if name.endswith(".png") and PurePosixPath(name).parent == directory
+    )
+
+def _changed(path, mtime_ns):
+    try:
+        return os.stat(path).st_mtime_ns != mtime_ns
+    except FileNotFoundError:
+        return True
+
+def _split_manifest(manifest, input_dir, mask_dir, lazy):
+    from src.corpus_index import CorpusIndex
+
+    with CorpusIndex(manifest) as index:
+        indexed = index.records(usable_only=False)
+        records = index.records()
+        groups = index.groups(records)
+    if not records:
+        raise ValueError(f"No usable images in manifest {manifest}.")
+
+    # The manifest must describe the directories given, as they are now
+    input_dir, mask_dir = os.path.abspath(input_dir), os.path.abspath(mask_dir)
+    stale = [r["path"] for r in records
+             if os.path.dirname(r["path"]) != input_dir or os.path.dirname(r["mask_path"]) != mask_dir
+             or _changed(r["path"], r["mtime_ns"]) or _changed(r["mask_path"], r["mask_mtime_ns"])]
+    known = {r["path"] for r in indexed}
+    stale += [str(p) for p in sorted(Path(input_dir).glob("*.png")) if str(p) not in known]
+    if stale:
+        raise ValueError(f"Manifest {manifest} is out of date for {input_dir} ({len(stale)} files differ, e.g. {stale[0]}); "
+                         f"run corpus_index.py on it again.")
+
+    image_files = [Path(r["path"]) for r in records]
+    mask_files = [Path(r["mask_path"]) for r in records]
+    splitter = GroupShuffleSplit(n_splits=1, test_size=0.15, random_state=42)
+    train_idx, val_idx = next(splitter.split(image_files, groups=groups))
+    if len(train_idx) == 0 or len(val_idx) == 0:
+        raise ValueError(f"The {len(set(groups))} duplicate groups in manifest {manifest} are too few to split into "
+                         f"training and validation images.")
+
+    def take(indices):
+        if lazy:
+            return [image_files[i] for i in indices], [mask_files[i] for i in indices]
+        pairs = [(preprocess_image(image_files[i]), _read_mask(mask_files[i])) for i in indices]
+        pairs = [(img, mask) for img, mask in pairs if img is not None]
+        return [img for img, _ in pairs], [mask for _, mask in pairs]
+
+    X_train, y_train = take(train_idx)
+    X_val, y_val = take(val_idx)
+    return X_train, X_val, y_train, y_val
+
+def load_data(input_dir, mask_dir, lazy=False, archive=None, manifest=None):
     """
     Loads and preprocesses images and masks from the specified directories.
 
     Args:
         input_dir (str): Path to the directory of training images.
         mask_dir (str): Path to the directory of mask images.
+        lazy (bool): If True, only the file paths are collected and split;
+            decoding is deferred to `LogoDataset.__getitem__`.
+        archive (ZipArchive): If given, `input_dir` and `mask_dir` are
+            directories inside this archive and the returned paths are
+            member names; pass the same archive to `LogoDataset`.
+        manifest (str): If given, the image and mask pairs are read from
+            this `CorpusIndex` SQLite file instead of scanning `input_dir`
+            and `mask_dir`. Unreadable images are already excluded, and
+            exact and near-duplicates are kept on the same side of the split.
+            The manifest must have been built from `input_dir` and
+            `mask_dir` and be up to date, otherwise ValueError is raised.
 
     Returns:
         tuple: A tuple containing training, validation, and test data splits.
     """
-    input_path = Path(input_dir)
-    mask_path = Path(mask_dir)
+    if manifest is not None:
+        if archive is not None:
+            raise ValueError("A manifest cannot be combined with a zip archive.")
+        return _split_manifest(manifest, input_dir, mask_dir, lazy)
 
-    image_files = sorted([p for p in input_path.glob("*.png")])
-    mask_files = sorted([p for p in mask_path.glob("*.png")])
+    if archive is not None:
+        input_path = PurePosixPath(input_dir)
+        mask_path = PurePosixPath(mask_dir)
+        image_files = _list_archive_pngs(archive, input_path)
+        mask_files = _list_archive_pngs(archive, mask_path)
+    else:
+        input_path = Path(input_dir)
+        mask_path = Path(mask_dir)
+        image_files = sorted([p for p in input_path.glob("*.png")])
+        mask_files = sorted([p for p in mask_path.glob("*.png")])
 
     if len(image_files) != len(mask_files):
         print(f"Warning: Mismatched number of images and masks. Found {len(image_files)} images and {len(mask_files)} masks.")
         image_names = {p.name for p in image_files}
         mask_names = {p.name for p in mask_files}
         common_names = sorted(list(image_names.intersection(mask_names)))
-        
+
         image_files = [input_path / name for name in common_names]
         mask_files = [mask_path / name for name in common_names]
 
+    if lazy:
+        return train_test_split(image_files, mask_files, test_size=0.15, random_state=42)
+
     # Preprocess images and load masks, filtering out corrupted images
     processed_data = [
-        (preprocess_image(img_path), Image.open(mask_path))
+        (preprocess_image(_open_source(img_path, archive)), _read_mask(_open_source(mask_path, archive)))
         for img_path, mask_path in zip(image_files, mask_files)
     ]
-    
+
     images = [img for img, mask in processed_data if img is not None]
     masks = [mask for img, mask in processed_data if img is not None]
 
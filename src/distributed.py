@@ -0,0 +1,66 @@
+import os
+import torch
+import torch.distributed as dist
+
+class DistributedContext:
+    """
+    Where this process sits in a (possibly single-process) training job.
+
+    `is_main` is True for the one process that logs and writes files.
+    """
+    def __init__(self, rank: int = 0, world_size: int = 1, local_rank: int = 0):
+        self.rank = rank
+        self.world_size = world_size
+        self.local_rank = local_rank
+        self.enabled = world_size > 1
+        self.is_main = rank == 0
+
+    def device(self) -> torch.device:
+        """Returns this process's GPU when CUDA is available, otherwise the CPU."""
+        if torch.cuda.is_available():
+            return torch.device("cuda", self.local_rank)
+        return torch.device("cpu")
+
+    def barrier(self) -> None:
+        if self.enabled:
+            dist.barrier()
+
+    def all_gather(self, obj) -> list:
+        """Returns `obj` from every process, in rank order. Every process must call this."""
+        if not self.enabled:
+            return [obj]
+        gathered = [None] * self.world_size
+        dist.all_gather_object(gathered, obj)
+        return gathered
+
+def init_distributed(backend: str = None) -> DistributedContext:
+    """
+    Joins the process group described by the environment variables torchrun sets.
+
+    Without torchrun (no `WORLD_SIZE` in the environment, or a world of one
+    process), nothing is initialized and a single-process context is returned.
+
+    Args:
+        backend: The process group backend. Defaults to "nccl" when CUDA is
+            available and "gloo" otherwise, so CPU-only machines work too.
+
+    Returns:
+        The context of this process.
+    """
+    world_size = int(os.environ.get("WORLD_SIZE", 1))
+    if world_size <= 1:
+        return DistributedContext()
+
+    context = DistributedContext(
+        rank=int(os.environ["RANK"]),
+        world_size=world_size,
+        local_rank=int(os.environ.get("LOCAL_RANK", 0)),
+    )
+    if torch.cuda.is_available():
+        torch.cuda.set_device(context.local_rank)
+    dist.init_process_group(backend or ("nccl" if torch.cuda.is_available() else "gloo"))
+    return context
+
+def cleanup_distributed() -> None:
+    if dist.is_available() and dist.is_initialized():
+        dist.destroy_process_group()
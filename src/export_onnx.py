@@ -0,0 +1,155 @@
+import argparse
+import os
+import time
+import numpy as np
+import onnxruntime as ort
+import torch
+import torch.nn as nn
+from src.inference import ARCHITECTURES, load_model
+
+# Input normalization applied by rembg sessions before running the model
+REMBG_MEAN = (0.485, 0.456, 0.406)
+REMBG_STD = (0.229, 0.224, 0.225)
+
+OPTIMIZATION_LEVELS = {
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+class RembgExportWrapper(nn.Module):
+    """
+    Adapts a U2NET for export as a rembg-compatible ONNX model.
+
+    Only the fused d0 head is returned, passed through a sigmoid like the
+    stock rembg models. rembg normalizes inputs with ImageNet mean and std,
+    while this trainer feeds the model plain [0, 1] tensors, so by default
+    the normalization is undone inside the graph.
+
+    Args:
+        model: A U2NET or U2NETP in eval mode.
+        denormalize: If True, map rembg-normalized inputs back to [0, 1].
+    """
+    def __init__(self, model: nn.Module, denormalize: bool = True):
+        super().__init__()
+        self.model = model
+        self.denormalize = denormalize
+        self.register_buffer("mean", torch.tensor(REMBG_MEAN).view(1, 3, 1, 1))
+        self.register_buffer("std", torch.tensor(REMBG_STD).view(1, 3, 1, 1))
+
+    def forward(self, x):
+        if self.denormalize:
+            x = x * self.std + self.mean
+        return torch.sigmoid(self.model(x)[0])
+
+def export_onnx(model: nn.Module, output_path: str, size: int = 320, opset: int = 17,
+                optimization_level: str = "basic", denormalize: bool = True) -> str:
+    """
+    Exports a trained model to an ONNX file that a rembg `u2net_custom` session can load.
+
+    The graph has a dynamic batch dimension and is optimized offline by
+    ONNX Runtime. The "basic" level only applies provider-independent
+    rewrites such as constant folding; "extended" and "all" add fusions that
+    tie the file to the CPU execution provider.
+
+    Usage with rembg (which only loads custom models from its model
+    directory, e.g. `~/.u2net`):
+        new_session("u2net_custom", model_path=output_path)
+
+    Args:
+        model: A U2NET or U2NETP in eval mode.
+        output_path: Where to write the optimized model.
+        size: Height and width of the example input used for tracing.
+        opset: ONNX opset version.
+        optimization_level: One of "basic", "extended" or "all".
+        denormalize: See `RembgExportWrapper`.
+
+    Returns:
+        The output path.
+    """
+    wrapper = RembgExportWrapper(model, denormalize).eval()
+    example_input = torch.rand(1, 3, size, size)
+    raw_path = f"{output_path}.raw"
+
+    torch.onnx.export(
+        wrapper,
+        (example_input,),
+        raw_path,
+        input_names=["input.1"],
+        output_names=["d0"],
+        dynamic_axes={"input.1": {0: "batch"}, "d0": {0: "batch"}},
+        opset_version=opset,
+        do_constant_folding=True,
+        dynamo=False,
+    )
+
+    # Let ONNX Runtime apply its graph optimizations once and save the result
+    options = ort.SessionOptions()
+    options.graph_optimization_level = OPTIMIZATION_LEVELS[optimization_level]
+    options.optimized_model_filepath = output_path
+    ort.InferenceSession(raw_path, options, providers=["CPUExecutionProvider"])
+
+    os.remove(raw_path)
+    return output_path
+
+def benchmark_parity(model: nn.Module, onnx_path: str, batch_size: int = 1, size: int = 320,
+                     iters: int = 10, denormalize: bool = True) -> dict:
+    """
+    Compares the exported model against PyTorch on CPU.
+
+    Returns:
+        A dict with the maximum absolute output difference and the mean
+        latency per batch in milliseconds of PyTorch and ONNX Runtime.
+    """
+    wrapper = RembgExportWrapper(model, denormalize).eval()
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+
+    x = torch.randn(batch_size, 3, size, size)
+    with torch.no_grad():
+        expected = wrapper(x).numpy()
+    actual = session.run(None, {input_name: x.numpy()})[0]
+
+    def timed(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(iters):
+            fn()
+        return (time.perf_counter() - start) / iters * 1000
+
+    with torch.no_grad():
+        torch_ms = timed(lambda: wrapper(x))
+    onnx_ms = timed(lambda: session.run(None, {input_name: x.numpy()}))
+
+    return {
+        "max_abs_diff": float(np.abs(expected - actual).max()),
+        "torch_ms": torch_ms,
+        "onnxruntime_ms": onnx_ms,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a trained U2-Net to a rembg-compatible ONNX model.")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Path to the trained weights or training checkpoint.")
+    parser.add_argument("--output_path", type=str, required=True, help="Path to write the ONNX model to.")
+    parser.add_argument("--arch", type=str, choices=list(ARCHITECTURES), default="u2net", help="Model architecture.")
+    parser.add_argument("--opset", type=int, default=17, help="ONNX opset version.")
+    parser.add_argument("--optimization_level", type=str, choices=list(OPTIMIZATION_LEVELS), default="basic", help="ONNX Runtime graph optimization level.")
+    parser.add_argument("--no_denormalize", action="store_true", help="Do not undo rembg's input normalization inside the graph.")
+    parser.add_argument("--benchmark", action="store_true", help="Check parity and latency against PyTorch after exporting.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Batch size for the benchmark.")
+    args = parser.parse_args()
+
+    model = load_model(args.checkpoint, args.arch)
+    denormalize = not args.no_denormalize
+    export_onnx(model, args.output_path, opset=args.opset,
+                optimization_level=args.optimization_level, denormalize=denormalize)
+    print(f"ONNX model saved to {args.output_path}")
+
+    if args.benchmark:
+        result = benchmark_parity(model, args.output_path, batch_size=args.batch_size, denormalize=denormalize)
+        print(f"Max abs diff: {result['max_abs_diff']:.2e}")
+        print(f"PyTorch:      {result['torch_ms']:8.2f} ms/batch")
+        print(f"onnxruntime:  {result['onnxruntime_ms']:8.2f} ms/batch ({result['torch_ms'] / result['onnxruntime_ms']:.2f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import argparse
+import copy
+import time
+import warnings
+import torch
+from src.u2net_model import U2NET, U2NETP, fuse_for_inference
+
+ARCHITECTURES = {
+    "u2net": U2NET,
+    "u2netp": U2NETP,
+}
+
+EXECUTION_MODES = ("eager", "compile", "script")
+
+def load_model(checkpoint_path: str, arch: str = "u2net", device: torch.device = torch.device("cpu"),
+               fuse: bool = False) -> torch.nn.Module:
+    """
+    Loads trained U2NET or U2NETP weights for inference.
+
+    Accepts both plain `state_dict` files (the trainer's final and best model
+    files) and full training checkpoints written by `CheckpointManager`.
+
+    Args:
+        checkpoint_path: The path to the weights file.
+        arch: "u2net" or "u2netp".
+        device: The device to load the model onto.
+        fuse: If True, fold BatchNorm into the convolutions with `fuse_for_inference`.
+
+    Returns:
+        The model in eval mode.
+    """
+    state = torch.load(checkpoint_path, map_location="cpu", weights_only=False)
+    if "model" in state and "optimizer" in state:
+        state = state["model"]
+
+    model = ARCHITECTURES[arch]()
+    model.load_state_dict(state)
+    model = model.to(device).eval()
+    return fuse_for_inference(model) if fuse else model
+
+def optimize_model(model: torch.nn.Module, mode: str, example_input: torch.Tensor) -> torch.nn.Module:
+    """
+    Wraps a model for faster execution.
+
+    "compile" runs the model through `torch.compile`. Compilation happens on
+    the first call, so the model is run once on `example_input` to surface
+    errors (e.g. a missing C++ toolchain) here, in eval mode without
+    gradients; on failure it falls back to a TorchScript trace. Neither
+    changes the BatchNorm running statistics or the train/eval mode of
+    `model`. "script" traces with TorchScript directly. Both
+    wrappers share their parameters with `model`, so training the wrapper
+    trains `model`, and checkpoints should be taken from `model` itself.
+
+    Args:
+        model: The model to wrap.
+        mode: One of "eager", "compile" or "script".
+        example_input: A representative input batch.
+
+    Returns:
+        The wrapped model, or `model` itself in eager mode.
+    """
+    if mode == "eager":
+        return model
+
+    if mode == "compile":
+        compiled = torch.compile(model)
+        training = model.training
+        try:
+            # The warm-up must not touch the BatchNorm running statistics
+            model.eval()
+            with torch.no_grad():
+                compiled(example_input)
+            return compiled
+        except Exception as e:
+            warnings.warn(f"torch.compile failed ({e}), falling back to TorchScript tracing.")
+        finally:
+            model.train(training)
+
+    # The trace records the current train/eval behaviour, so it runs in the
+    # caller's mode; buffers updated by the traced forward are restored.
+    buffers = {name: buffer.clone() for name, buffer in model.named_buffers()}
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", FutureWarning)  # torch.jit is deprecated in favour of torch.compile
+            return torch.jit.trace(model, example_input, check_trace=False)
+    finally:
+        with torch.no_grad():
+            for name, buffer in model.named_buffers():
+                buffer.copy_(buffers[name])
+
+def benchmark(model: torch.nn.Module, example_input: torch.Tensor, warmup: int = 3, iters: int = 10) -> float:
+    """
+    Measures the forward latency of a model.
+
+    Returns:
+        The mean latency per forward pass in milliseconds.
+    """
+    with torch.no_grad():
+        for _ in range(warmup):
+            model(example_input)
+        if example_input.device.type == "cuda":
+            torch.cuda.synchronize()
+
+        start = time.perf_counter()
+        for _ in range(iters):
+            model(example_input)
+        if example_input.device.type == "cuda":
+            torch.cuda.synchronize()
+
+    return (time.perf_counter() - start) / iters * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark U2-Net inference in eager, compiled and TorchScript modes.")
+    parser.add_argument("--checkpoint", type=str, default=None, help="Path to trained weights. Random weights are used if omitted.")
+    parser.add_argument("--arch", type=str, choices=list(ARCHITECTURES), default="u2net", help="Model architecture.")
+    parser.add_argument("--mode", type=str, choices=EXECUTION_MODES, default="compile", help="Execution mode to compare against eager.")
+    parser.add_argument("--fuse", action="store_true", help="Fold BatchNorm into the convolutions before running the compared mode.")
+    parser.add_argument("--batch_size", type=int, default=1, help="Batch size of the benchmark input.")
+    parser.add_argument("--size", type=int, default=320, help="Height and width of the benchmark input.")
+    parser.add_argument("--iters", type=int, default=10, help="Number of timed forward passes.")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu", help="Device to run on.")
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    if args.checkpoint:
+        model = load_model(args.checkpoint, args.arch, device)
+    else:
+        model = ARCHITECTURES[args.arch]().to(device).eval()
+
+    example_input = torch.rand(args.batch_size, 3, args.size, args.size, device=device)
+    eager_ms = benchmark(model, example_input, iters=args.iters)
+    candidate = fuse_for_inference(copy.deepcopy(model), example_input) if args.fuse else model
+    optimized = optimize_model(candidate, args.mode, example_input)
+    optimized_ms = benchmark(optimized, example_input, iters=args.iters)
+
+    with torch.no_grad():
+        max_diff = (model(example_input)[0] - optimized(example_input)[0]).abs().max().item()
+
+    print(f"{args.arch} on {device}, input {tuple(example_input.shape)}")
+    label = f"{args.mode}{'+fused' if args.fuse else ''}:"
+    print(f"  {'eager:':<13} {eager_ms:8.2f} ms/batch")
+    print(f"  {label:<13} {optimized_ms:8.2f} ms/batch ({eager_ms / optimized_ms:.2f}x), max abs diff {max_diff:.2e}")
+
+if __name__ == "__main__":
+    main()
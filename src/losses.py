@@ -0,0 +1,61 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+REGION_LOSSES = ("none", "iou", "dice")
+
+class DeepSupervisionLoss(nn.Module):
+    """
+    Weighted loss over any number of U2NET outputs, computed in one pass.
+
+    The outputs are stacked into a single (K, B, 1, H, W) tensor so binary
+    cross-entropy, and optionally a soft IoU or Dice loss, is evaluated for
+    all K heads with one call each instead of one call per head. With a
+    single output and no region loss this equals `BCEWithLogitsLoss` on d0.
+
+    Args:
+        weights: Weight of each output's loss, d0 first. Defaults to 1 for every output.
+        region_loss: "none", "iou" or "dice".
+        region_weight: Weight of the region loss relative to the cross-entropy.
+    """
+    def __init__(self, weights=None, region_loss: str = "none", region_weight: float = 1.0):
+        super().__init__()
+        if region_loss not in REGION_LOSSES:
+            raise ValueError(f"Unknown region loss '{region_loss}', expected one of {REGION_LOSSES}.")
+        self.weights = None if weights is None else torch.as_tensor(weights, dtype=torch.float32)
+        self.region_loss = region_loss
+        self.region_weight = region_weight
+
+    def per_output(self, outputs, masks: torch.Tensor) -> torch.Tensor:
+        """
+        Returns the unweighted loss of every output as a tensor of shape (K,).
+
+        Args:
+            outputs: A sequence of K logit tensors of shape (B, 1, H, W).
+            masks: Ground truth masks in [0, 1] of shape (B, 1, H, W).
+        """
+        logits = torch.stack(tuple(outputs)).float()
+        targets = masks.float().unsqueeze(0).expand_as(logits)
+
+        loss = F.binary_cross_entropy_with_logits(logits, targets, reduction='none').flatten(1).mean(dim=1)
+
+        if self.region_loss != "none":
+            probs = torch.sigmoid(logits).flatten(2)
+            targets = targets.flatten(2)
+            intersection = (probs * targets).sum(dim=2)
+            total = probs.sum(dim=2) + targets.sum(dim=2)
+            if self.region_loss == "iou":
+                score = (intersection + 1) / (total - intersection + 1)
+            else:
+                score = (2 * intersection + 1) / (total + 1)
+            loss = loss + self.region_weight * (1 - score).mean(dim=1)
+
+        return loss
+
+    def forward(self, outputs, masks: torch.Tensor) -> torch.Tensor:
+        loss = self.per_output(outputs, masks)
+        if self.weights is None:
+            return loss.sum()
+        if len(self.weights) != len(loss):
+            raise ValueError(f"Got {len(loss)} outputs but {len(self.weights)} loss weights.")
+        return (self.weights.to(loss.device) * loss).sum()
@@ -1,53 +1,136 @@
 import os
 import random
 import logging
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from image_utils import load_image, save_image, crop_background, composite_images
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Per-process state, set up by `_init_worker`
+_load_background = None
+_config = None
+
+def _init_worker(transparent_dir: str, bg_dir: str, background_images: list, output_dir: str, cache_size: int) -> None:
+    """
+    Sets up the directories and the bounded background cache of a worker process.
+
+    Backgrounds are large JPEGs that are reused by many foregrounds, so each
+    worker decodes a background once and keeps up to `cache_size` of them.
+    """
+    global _load_background, _config
+    _config = (transparent_dir, bg_dir, background_images, output_dir)
+
+    @lru_cache(maxsize=cache_size)
+    def load_background(path: str):
+        image = load_image(path)
+        image.load()
+        return image
+
+    _load_background = load_background
+
+def _output_name(image_name: str, index: int, per_foreground: int) -> str:
+    if per_foreground == 1:
+        return image_name
+    stem, ext = os.path.splitext(image_name)
+    return f"{stem}_{index:04d}{ext}"
+
+def composite_foreground(transparent_image_name: str, per_foreground: int, seed: int) -> tuple:
+    """
+    Composites one transparent image onto `per_foreground` random backgrounds.
+
+    Each composite draws its background and crop position from its own RNG,
+    seeded from `seed`, the image name and the composite index, so the output
+    does not depend on how the work is spread over processes.
+
+    Returns:
+        A tuple of the image name, the number of composites written and a list
+        of (log level, message) pairs for the problems encountered.
+    """
+    transparent_dir, bg_dir, background_images, output_dir = _config
+    transparent_image_path = os.path.join(transparent_dir, transparent_image_name)
+    try:
+        transparent_image = load_image(transparent_image_path)
+        transparent_image.load()
+    except Exception as e:
+        return transparent_image_name, 0, [(logging.ERROR, f"Error processing {transparent_image_name}: {e}")]
+
+    written = 0
+    errors = []
+    for index in range(per_foreground):
+        rng = random.Random(f"{seed}:{transparent_image_name}:{index}")
+        try:
+            bg_image_name = rng.choice(background_images)
+            background_image = _load_background(os.path.join(bg_dir, bg_image_name))
+
+            cropped_bg = crop_background(background_image, transparent_image.width, transparent_image.height, rng)
+            final_image = composite_images(cropped_bg, transparent_image)
+
+            output_path = os.path.join(output_dir, _output_name(transparent_image_name, index, per_foreground))
+            save_image(final_image, output_path)
+            written += 1
+
+        except ValueError as e:
+            errors.append((logging.WARNING, f"Skipping {transparent_image_name} due to small background: {e}"))
+        except Exception as e:
+            errors.append((logging.ERROR, f"Error processing {transparent_image_name}: {e}"))
+
+    return transparent_image_name, written, errors
+
 def main() -> None:
     """
     Main function to process transparent images and add backgrounds.
-    
+
     This script reads transparent images from `data/transparent`,
     backgrounds from `data/bg-sample`, and saves the composited
-    images to `data/output`.
+    images to `data/output`. Foregrounds are spread over a pool of
+    worker processes.
     """
-    transparent_dir = 'data/transparent'
-    bg_dir = 'data/bg-sample'
-    output_dir = 'data/output'
+    parser = argparse.ArgumentParser(description="Composite transparent logos onto random backgrounds.")
+    parser.add_argument("--transparent_dir", type=str, default='data/transparent', help="Directory of transparent PNG logos.")
+    parser.add_argument("--bg_dir", type=str, default='data/bg-sample', help="Directory of background images.")
+    parser.add_argument("--output_dir", type=str, default='data/output', help="Directory to write the composites to.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of worker processes.")
+    parser.add_argument("--per_foreground", type=int, default=1, help="Number of composites to generate per logo.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for reproducible output.")
+    parser.add_argument("--bg_cache_size", type=int, default=64, help="Maximum number of decoded backgrounds kept per worker.")
+    args = parser.parse_args()
 
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    if not os.path.exists(args.output_dir):
+        os.makedirs(args.output_dir)
 
-    transparent_images = [f for f in os.listdir(transparent_dir) if f.endswith('.png')]
-    background_images = [f for f in os.listdir(bg_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    transparent_images = sorted(f for f in os.listdir(args.transparent_dir) if f.endswith('.png'))
+    background_images = sorted(f for f in os.listdir(args.bg_dir) if f.lower().endswith(('.png', '.jpg', '.jpeg')))
 
     if not background_images:
         logging.warning("No background images found.")
         return
 
-    for transparent_image_name in transparent_images:
-        try:
-            transparent_image_path = os.path.join(transparent_dir, transparent_image_name)
-            transparent_image = load_image(transparent_image_path)
-
-            bg_image_name = random.choice(background_images)
-            bg_image_path = os.path.join(bg_dir, bg_image_name)
-            background_image = load_image(bg_image_path)
+    initargs = (args.transparent_dir, args.bg_dir, background_images, args.output_dir, args.bg_cache_size)
+    chunksize = max(1, len(transparent_images) // (4 * args.workers))
+    start = time.perf_counter()
+    total = 0
 
-            cropped_bg = crop_background(background_image, transparent_image.width, transparent_image.height)
-            final_image = composite_images(cropped_bg, transparent_image)
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=initargs) as executor:
+        results = executor.map(
+            composite_foreground,
+            transparent_images,
+            [args.per_foreground] * len(transparent_images),
+            [args.seed] * len(transparent_images),
+            chunksize=chunksize,
+        )
+        for transparent_image_name, written, errors in results:
+            for level, message in errors:
+                logging.log(level, message)
+            if written:
+                logging.info(f"Processed {transparent_image_name}")
+            total += written
 
-            output_path = os.path.join(output_dir, transparent_image_name)
-            save_image(final_image, output_path)
-            logging.info(f"Processed {transparent_image_name}")
-
-        except ValueError as e:
-            logging.warning(f"Skipping {transparent_image_name} due to small background: {e}")
-        except Exception as e:
-            logging.error(f"Error processing {transparent_image_name}: {e}")
+    elapsed = time.perf_counter() - start
+    logging.info(f"Wrote {total} composites in {elapsed:.1f}s ({total / max(elapsed, 1e-9):.1f} images/s).")
 
 if __name__ == "__main__":
     main()
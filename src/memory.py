@@ -0,0 +1,80 @@
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+import torch
+from src.inference import ARCHITECTURES
+
+def reset_peak_memory(device: torch.device) -> None:
+    """Starts a new peak memory measurement on CUDA; the CPU peak can not be reset."""
+    if device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+def peak_memory_mb(device: torch.device) -> float:
+    """
+    Returns the peak memory in MB.
+
+    On CUDA this is the peak memory allocated by tensors since the last
+    `reset_peak_memory`. On CPU it is the peak resident set size of the
+    whole process, which only ever grows.
+    """
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / 2 ** 20
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+def measure_training_step(arch: str, batch_size: int, size: int, activation_checkpointing: bool,
+                          device_name: str, accumulate_steps: int = 1) -> dict:
+    """
+    Runs one optimizer step and measures how much memory it needs beyond the model itself.
+
+    Returns:
+        A dict with the peak memory added by the step in MB and the step time in milliseconds.
+    """
+    device = torch.device(device_name)
+    torch.manual_seed(0)
+    model = ARCHITECTURES[arch](activation_checkpointing=activation_checkpointing).to(device).train()
+    optimizer = torch.optim.Adam(model.parameters())
+    criterion = torch.nn.BCEWithLogitsLoss()
+    images = torch.rand(batch_size, 3, size, size, device=device)
+    masks = (torch.rand(batch_size, 1, size, size, device=device) > 0.5).float()
+
+    reset_peak_memory(device)
+    baseline = torch.cuda.memory_allocated(device) / 2 ** 20 if device.type == "cuda" else peak_memory_mb(device)
+    start = time.perf_counter()
+    for _ in range(accumulate_steps):
+        loss = criterion(model(images)[0], masks) / accumulate_steps
+        loss.backward()
+    optimizer.step()
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+    return {
+        "peak_mb": peak_memory_mb(device) - baseline,
+        "step_ms": (time.perf_counter() - start) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the peak training memory of U2-Net with and without activation checkpointing.")
+    parser.add_argument("--arch", type=str, choices=list(ARCHITECTURES), default="u2net", help="Model architecture.")
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 2, 4], help="Micro-batch sizes to measure.")
+    parser.add_argument("--accumulate_steps", type=int, default=1, help="Micro-batches accumulated per optimizer step.")
+    parser.add_argument("--size", type=int, default=320, help="Height and width of the input.")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu", help="Device to run on.")
+    args = parser.parse_args()
+
+    # The CPU peak can not be reset, so every configuration runs in a fresh process
+    context = multiprocessing.get_context("spawn")
+    print(f"{args.arch} on {args.device}, {args.size}x{args.size} inputs, {args.accumulate_steps} accumulation step(s)")
+    print(f"{'batch':>6} {'checkpointing':>14} {'peak (MB)':>10} {'step (ms)':>10}")
+    for batch_size in args.batch_sizes:
+        for checkpointing in (False, True):
+            with context.Pool(1) as pool:
+                result = pool.apply(measure_training_step, (args.arch, batch_size, args.size, checkpointing,
+                                                            args.device, args.accumulate_steps))
+            print(f"{batch_size:6} {'on' if checkpointing else 'off':>14} {result['peak_mb']:10.0f} {result['step_ms']:10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import math
+import torch
+import torch.distributed as dist
+
+def _ratio(numerator, denominator, empty=1.0):
+    # An empty denominator means there was nothing to get wrong
+    return numerator / denominator if denominator else empty
+
+def scores_from_counts(tp, fp, fn) -> dict:
+    """
+    Computes IoU, F1, precision and recall from confusion counts.
+
+    Args:
+        tp: Number of true positive pixels.
+        fp: Number of false positive pixels.
+        fn: Number of false negative pixels.
+
+    Returns:
+        A dict with the keys "iou", "f1", "precision" and "recall".
+    """
+    return {
+        "iou": _ratio(tp, tp + fp + fn),
+        "f1": _ratio(2 * tp, 2 * tp + fp + fn),
+        "precision": _ratio(tp, tp + fp),
+        "recall": _ratio(tp, tp + fn),
+    }
+
+class SegmentationMetrics:
+    """
+    Accumulates binary segmentation metrics over a whole validation set.
+
+    True positive, false positive, false negative and true negative pixel
+    counts are summed on the device the predictions live on, so `update`
+    never waits for the device. `compute` transfers the totals once and
+    derives dataset-level scores from them, which weighs every pixel equally
+    instead of averaging per-batch ratios.
+
+    Args:
+        device: The device to accumulate on.
+        threshold: Probability above which a pixel is predicted as foreground.
+        per_image: If True, also keep the counts of every image for `per_image_scores`;
+            `update` then needs an identifier for every image.
+    """
+    def __init__(self, device, threshold: float = 0.5, per_image: bool = False):
+        self.device = device
+        # Compare logits directly instead of applying a sigmoid first
+        self.logit_threshold = math.log(threshold / (1 - threshold))
+        self.per_image = per_image
+        self.reset()
+
+    def reset(self) -> None:
+        self.counts = torch.zeros(4, dtype=torch.int64, device=self.device)
+        self.image_counts = []
+        self.image_ids = []
+
+    def update(self, logits: torch.Tensor, masks: torch.Tensor, ids=None) -> None:
+        """
+        Adds a batch to the running counts.
+
+        Args:
+            logits: Raw model outputs of shape (B, 1, H, W).
+            masks: Ground truth masks in [0, 1] of the same shape; values above 0.5 count as foreground.
+            ids: An identifier per image, e.g. its path. Required with `per_image`.
+        """
+        if self.per_image and (ids is None or len(ids) != logits.shape[0]):
+            raise ValueError("per_image metrics need one id per image in the batch")
+        preds = logits > self.logit_threshold
+        targets = masks > 0.5
+        dims = tuple(range(1, preds.dim()))
+
+        tp = (preds & targets).sum(dim=dims)
+        fp = (preds & ~targets).sum(dim=dims)
+        fn = (~preds & targets).sum(dim=dims)
+        tn = (~preds & ~targets).sum(dim=dims)
+        batch_counts = torch.stack((tp, fp, fn, tn), dim=1)
+
+        self.counts += batch_counts.sum(dim=0)
+        if self.per_image:
+            self.image_counts.append(batch_counts)
+            self.image_ids.extend(ids)
+
+    def all_reduce(self) -> None:
+        """
+        Combines the counts of every process in a distributed job, so each
+        process computes scores over the whole validation set.
+
+        Totals are summed across processes and per-image counts are gathered
+        together with their ids. Outside a process group this does nothing.
+        """
+        if not (dist.is_available() and dist.is_initialized()):
+            return
+
+        dist.all_reduce(self.counts)
+        if self.per_image:
+            local = torch.cat(self.image_counts) if self.image_counts else self.counts.new_zeros((0, 4))
+            gathered = [None] * dist.get_world_size()
+            dist.all_gather_object(gathered, (local.cpu(), self.image_ids))
+            self.image_counts = [counts.to(self.device) for counts, _ in gathered]
+            self.image_ids = [image_id for _, ids in gathered for image_id in ids]
+
+    def compute(self) -> dict:
+        """Returns the dataset-level IoU, F1, precision and recall."""
+        tp, fp, fn, _ = self.counts.tolist()
+        return scores_from_counts(tp, fp, fn)
+
+    def per_image_scores(self) -> dict:
+        """Returns the scores of every image, keyed by the id it was added with."""
+        if not self.image_counts:
+            return {}
+        counts = torch.cat(self.image_counts).tolist()
+        return {image_id: scores_from_counts(tp, fp, fn) for image_id, (tp, fp, fn, _) in zip(self.image_ids, counts)}
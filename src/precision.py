@@ -0,0 +1,35 @@
+import contextlib
+import torch
+
+PRECISIONS = ("fp32", "fp16", "bf16")
+
+_DTYPES = {
+    "fp32": None,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16,
+}
+
+def autocast(device: torch.device, precision: str):
+    """
+    Returns the autocast context for running the model at the given precision.
+
+    Args:
+        device: The device the model runs on. Autocast works on both CUDA and CPU.
+        precision: One of "fp32", "fp16" or "bf16". "fp32" disables autocast.
+
+    Returns:
+        A context manager.
+    """
+    dtype = _DTYPES[precision]
+    if dtype is None:
+        return contextlib.nullcontext()
+    return torch.autocast(device_type=device.type, dtype=dtype)
+
+def grad_scaler(device: torch.device, precision: str) -> torch.amp.GradScaler:
+    """
+    Returns a gradient scaler for the given precision.
+
+    Only fp16 has a narrow enough exponent range to need loss scaling; for the
+    other precisions the scaler is disabled and its methods are pass-throughs.
+    """
+    return torch.amp.GradScaler(device.type, enabled=precision == "fp16")
@@ -0,0 +1,256 @@
+import argparse
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+import torch
+import torch.nn.functional as F
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision.transforms.functional import to_tensor
+from src.image_utils import aspect_buckets, closest_bucket, flatten_to_rgb
+from src.inference import ARCHITECTURES, load_model
+from src.precision import PRECISIONS, autocast
+from src.zip_utils import ZipArchive, _member_target
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+class PredictDataset(Dataset):
+    """
+    Decodes input images for prediction.
+
+    Images are flattened to RGB and resized to the aspect bucket closest to
+    their own aspect ratio, so they can be batched with other images of the
+    same bucket without distortion or padding. Images whose longer side
+    exceeds `tile_min_side` are instead kept at (up to `max_side`) full
+    resolution for tiled prediction.
+
+    Each item is a dict with the image name, its original size, the image
+    tensor and either its bucket or `tiled=True`; unreadable images yield None.
+    """
+    def __init__(self, names, buckets, archive=None, tile_min_side=None, max_side=2048):
+        self.names = names
+        self.buckets = buckets
+        self.archive = archive
+        self.tile_min_side = tile_min_side
+        self.max_side = max_side
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, idx):
+        name = self.names[idx]
+        source = self.archive.open(name) if self.archive is not None else name
+        try:
+            with Image.open(source) as image:
+                image = flatten_to_rgb(image)
+        except (Image.UnidentifiedImageError, OSError):
+            print(f"Warning: Corrupted image detected and skipped: {name}")
+            return None
+
+        sample = {"name": str(name), "size": image.size}
+        if self.tile_min_side and max(image.size) > self.tile_min_side:
+            if max(image.size) > self.max_side:
+                image.thumbnail((self.max_side, self.max_side), Image.Resampling.LANCZOS)
+            sample.update(tiled=True, image=to_tensor(image))
+        else:
+            bucket = closest_bucket(*image.size, self.buckets)
+            sample.update(tiled=False, bucket=bucket, image=to_tensor(image.resize(bucket, Image.Resampling.LANCZOS)))
+        return sample
+
+def _blend_window(size, overlap, device):
+    # Weights ramp up linearly across the overlap so neighbouring tiles cross-fade
+    ramp = torch.ones(size, device=device)
+    if overlap > 0:
+        steps = torch.arange(1, overlap + 1, device=device, dtype=torch.float32) / (overlap + 1)
+        ramp[:overlap] = steps
+        ramp[-overlap:] = steps.flip(0)
+    return ramp[:, None] * ramp[None, :]
+
+def _tile_starts(length, tile_size, stride):
+    if length <= tile_size:
+        return [0]
+    starts = list(range(0, length - tile_size, stride))
+    return starts + [length - tile_size]
+
+class Predictor:
+    """
+    Runs a U2NET over images and returns probability maps at their original size.
+
+    Args:
+        model: A U2NET or U2NETP in eval mode.
+        device: The device the model is on.
+        precision: One of "fp32", "fp16" or "bf16", see `precision.autocast`.
+    """
+    def __init__(self, model, device, precision="fp32"):
+        self.model = model
+        self.device = device
+        self.precision = precision
+
+    @torch.no_grad()
+    def forward(self, images):
+        """Returns the d0 probabilities for a (B, 3, H, W) batch."""
+        with autocast(self.device, self.precision):
+            logits = self.model(images.to(self.device, non_blocking=True))[0]
+        return torch.sigmoid(logits.float())
+
+    def predict_batch(self, samples):
+        """Predicts a list of same-bucket samples in one forward pass."""
+        probs = self.forward(torch.stack([sample["image"] for sample in samples]))
+        return [
+            F.interpolate(prob[None], size=sample["size"][::-1], mode='bilinear')[0, 0]
+            for prob, sample in zip(probs, samples)
+        ]
+
+    def predict_tiled(self, sample, tile_size=320, overlap=64, batch_size=8):
+        """
+        Predicts a large image as overlapping tiles and blends them back together.
+        """
+        image = sample["image"]
+        _, height, width = image.shape
+        pad_bottom, pad_right = max(0, tile_size - height), max(0, tile_size - width)
+        if pad_bottom or pad_right:
+            image = F.pad(image[None], (0, pad_right, 0, pad_bottom), mode='replicate')[0]
+        _, padded_height, padded_width = image.shape
+
+        stride = tile_size - overlap
+        positions = [(top, left)
+                     for top in _tile_starts(padded_height, tile_size, stride)
+                     for left in _tile_starts(padded_width, tile_size, stride)]
+
+        output = torch.zeros(padded_height, padded_width, device=self.device)
+        weights = torch.zeros_like(output)
+        window = _blend_window(tile_size, overlap, self.device)
+
+        for start in range(0, len(positions), batch_size):
+            batch_positions = positions[start:start + batch_size]
+            tiles = torch.stack([image[:, top:top + tile_size, left:left + tile_size]
+                                 for top, left in batch_positions])
+            for (top, left), prob in zip(batch_positions, self.forward(tiles)):
+                output[top:top + tile_size, left:left + tile_size] += prob[0] * window
+                weights[top:top + tile_size, left:left + tile_size] += window
+
+        output = (output / weights)[:height, :width]
+        return F.interpolate(output[None, None], size=sample["size"][::-1], mode='bilinear')[0, 0]
+
+def _keep_sample(sample):
+    return sample
+
+def list_inputs(input_path, archive=None):
+    """Returns the image paths in a directory, or the image member names in an archive."""
+    if archive is not None:
+        return sorted(PurePosixPath(name) for name in archive.namelist() if name.lower().endswith(IMAGE_EXTENSIONS))
+    return sorted(p for p in Path(input_path).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+
+def output_names(names, output_dir, input_path=None) -> dict:
+    """
+    Maps every input to the path of its mask inside `output_dir`: the path
+    relative to `input_path` (or the archive member name) with a .png suffix,
+    so inputs of the same name in different directories do not overwrite
+    each other.
+
+    Raises:
+        ValueError: If two inputs map to the same mask, e.g. "a.jpg" and "a.png",
+            or an archive member would be written outside `output_dir`.
+    """
+    output_dir = os.path.realpath(output_dir)
+    outputs = {}
+    for name in names:
+        relative = PurePosixPath(name) if input_path is None else PurePosixPath(Path(name).relative_to(input_path).as_posix())
+        # Archive members such as "../x.png" or "/etc/x.png" must not escape output_dir
+        outputs[str(name)] = _member_target(output_dir, str(relative.with_suffix(".png")))
+
+    seen = {}
+    for name, output in outputs.items():
+        seen.setdefault(output, []).append(name)
+    collisions = [sources for sources in seen.values() if len(sources) > 1]
+    if collisions:
+        raise ValueError("Inputs would overwrite each other's masks: " + "; ".join(", ".join(c) for c in collisions))
+    return outputs
+
+def _save_mask(prob, path, threshold):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if threshold is not None:
+        prob = (prob > threshold).float()
+    Image.fromarray((prob * 255).round().byte().cpu().numpy(), mode='L').save(path)
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict logo masks with a trained U2-Net.")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Path to the trained weights or training checkpoint.")
+    parser.add_argument("--input", type=str, required=True, help="Directory of images or a zip archive.")
+    parser.add_argument("--output_dir", type=str, required=True, help="Directory to write the masks to.")
+    parser.add_argument("--arch", type=str, choices=list(ARCHITECTURES), default="u2net", help="Model architecture.")
+    parser.add_argument("--batch_size", type=int, default=8, help="Number of images (or tiles) per forward pass.")
+    parser.add_argument("--size", type=int, default=320, help="Side of the square resolution whose pixel count every aspect bucket matches.")
+    parser.add_argument("--tile", action="store_true", help="Predict large images as overlapping tiles instead of downscaling them.")
+    parser.add_argument("--tile_size", type=int, default=320, help="Side of each tile.")
+    parser.add_argument("--tile_overlap", type=int, default=64, help="Overlap between neighbouring tiles in pixels.")
+    parser.add_argument("--tile_min_side", type=int, default=1024, help="Only tile images whose longer side exceeds this.")
+    parser.add_argument("--max_side", type=int, default=2048, help="Downscale tiled images so their longer side is at most this.")
+    parser.add_argument("--threshold", type=float, default=None, help="Write binary masks at this probability instead of soft masks.")
+    parser.add_argument("--num_workers", type=int, default=min(8, os.cpu_count() or 1), help="Number of image decoding workers.")
+    parser.add_argument("--precision", type=str, choices=PRECISIONS, default="fp32", help="Numeric precision for the forward pass.")
+    parser.add_argument("--fuse", action="store_true", help="Fold BatchNorm into the convolutions before predicting.")
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu", help="Device to run on.")
+    args = parser.parse_args()
+
+    if args.tile and not 0 <= args.tile_overlap < args.tile_size:
+        parser.error("--tile_overlap must be at least 0 and smaller than --tile_size.")
+
+    device = torch.device(args.device)
+    predictor = Predictor(load_model(args.checkpoint, args.arch, device, fuse=args.fuse), device, args.precision)
+
+    archive = ZipArchive(args.input) if args.input.lower().endswith('.zip') else None
+    names = list_inputs(args.input, archive)
+    try:
+        outputs = output_names(names, args.output_dir, None if archive is not None else args.input)
+    except ValueError as e:
+        parser.error(str(e))
+    dataset = PredictDataset(names, aspect_buckets(args.size), archive,
+                             tile_min_side=args.tile_min_side if args.tile else None, max_side=args.max_side)
+    loader = DataLoader(dataset, batch_size=None, num_workers=args.num_workers,
+                        pin_memory=device.type == "cuda", collate_fn=_keep_sample)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    start = time.perf_counter()
+    written = 0
+
+    # PNG encoding runs on a thread pool so it overlaps with the next forward pass
+    with ThreadPoolExecutor(max_workers=2) as writer:
+        writes = []
+
+        def save(samples, probs):
+            for sample, prob in zip(samples, probs):
+                writes.append(writer.submit(_save_mask, prob, outputs[str(sample["name"])], args.threshold))
+
+        pending = defaultdict(list)
+        for sample in loader:
+            if sample is None:
+                continue
+            if sample["tiled"]:
+                save([sample], [predictor.predict_tiled(sample, args.tile_size, args.tile_overlap, args.batch_size)])
+                written += 1
+                continue
+
+            queue = pending[sample["bucket"]]
+            queue.append(sample)
+            if len(queue) == args.batch_size:
+                save(queue, predictor.predict_batch(queue))
+                written += len(queue)
+                pending[sample["bucket"]] = []
+
+        for queue in pending.values():
+            if queue:
+                save(queue, predictor.predict_batch(queue))
+                written += len(queue)
+
+        # Re-raise the first failed write instead of losing it
+        for future in writes:
+            future.result()
+
+    elapsed = time.perf_counter() - start
+    print(f"Predicted {written} masks in {elapsed:.1f}s ({written / max(elapsed, 1e-9):.1f} images/s) to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import contextlib
+import json
+import os
+import time
+import torch
+from src.memory import peak_memory_mb
+
+PHASES = ("data", "h2d", "augment", "forward", "backward", "optimizer")
+
+class StepTimer:
+    """
+    Accumulates per-phase wall time of training steps.
+
+    Every phase is also labelled with `torch.profiler.record_function`, so it
+    shows up by name in profiler traces. On CUDA the device is synchronized
+    around each timed phase, which makes the times exact but costs some
+    throughput; with `enabled=False` phases are only labelled, not timed.
+
+    A step counts as starved when waiting for the DataLoader took longer
+    than `starvation_ms`, meaning the workers did not have a batch ready.
+
+    Args:
+        device: The device the model runs on.
+        enabled: Whether to time phases.
+        starvation_ms: Data wait above which a step counts as starved.
+    """
+    def __init__(self, device, enabled: bool = True, starvation_ms: float = 5.0):
+        self.device = device
+        self.enabled = enabled
+        self.starvation_ms = starvation_ms
+        self.reset()
+
+    def reset(self) -> None:
+        self.totals = dict.fromkeys(PHASES, 0.0)
+        self.steps = 0
+        self.samples = 0
+        self.starved_steps = 0
+        self._step_data_wait = 0.0
+        self._started = time.perf_counter()
+
+    def _synchronize(self):
+        if self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        with torch.profiler.record_function(name):
+            if not self.enabled:
+                yield
+                return
+            self._synchronize()
+            start = time.perf_counter()
+            yield
+            self._synchronize()
+            self.totals[name] += time.perf_counter() - start
+
+    def iterate(self, iterable):
+        """Yields the items of `iterable`, timing each fetch as the "data" phase."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            with torch.profiler.record_function("data"):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            self._step_data_wait = time.perf_counter() - start
+            self.totals["data"] += self._step_data_wait
+            yield item
+
+    def step(self, batch_size: int) -> None:
+        """Marks the end of a training step over `batch_size` samples."""
+        self.steps += 1
+        self.samples += batch_size
+        if self._step_data_wait * 1000 > self.starvation_ms:
+            self.starved_steps += 1
+
+    def summary(self) -> dict:
+        """
+        Returns throughput and timing since the last `reset`.
+
+        Phase times are mean milliseconds per step. Peak memory is the peak
+        allocated CUDA memory when training on a GPU and the peak resident
+        set size of the process otherwise.
+        """
+        elapsed = time.perf_counter() - self._started
+        steps = max(self.steps, 1)
+        summary = {
+            "steps": self.steps,
+            "samples_per_sec": self.samples / elapsed if elapsed > 0 else 0.0,
+            "starved_steps": self.starved_steps,
+            "data_wait_fraction": self.totals["data"] / elapsed if elapsed > 0 else 0.0,
+            "peak_memory_mb": peak_memory_mb(self.device),
+        }
+        if self.enabled:
+            summary.update({f"{name}_ms": total / steps * 1000 for name, total in self.totals.items()})
+        else:
+            summary["data_ms"] = self.totals["data"] / steps * 1000
+        return summary
+
+def trace_profiler(trace_dir: str, wait: int, active: int, rank: int = 0):
+    """
+    Returns a `torch.profiler.profile` that records one window of steps and
+    exports it as a Chrome trace (open in chrome://tracing or Perfetto).
+
+    The first `wait` steps are skipped and the next one is used for warm-up,
+    then `active` steps are recorded. Call `start()` before training,
+    `step()` after every training step and `stop()` at the end, or use the
+    profiler as a context manager.
+    """
+    os.makedirs(trace_dir, exist_ok=True)
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+
+    def export(profiler):
+        path = os.path.join(trace_dir, f"trace_rank{rank}_step{profiler.step_num}.json")
+        profiler.export_chrome_trace(path)
+        print(f"Profiler trace written to {path}")
+
+    return torch.profiler.profile(
+        activities=activities,
+        schedule=torch.profiler.schedule(wait=wait, warmup=1, active=active, repeat=1),
+        on_trace_ready=export,
+        record_shapes=True,
+        profile_memory=True,
+    )
+
+class MetricsLog:
+    """Appends one JSON object per line to a file, one line per epoch."""
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, record: dict) -> None:
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + "\n")
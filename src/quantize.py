@@ -0,0 +1,143 @@
+import argparse
+import os
+import tempfile
+import time
+import onnxruntime as ort
+import torch
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from torchvision import transforms
+from src.data_loader import load_data, LogoDataset
+from src.export_onnx import REMBG_MEAN, REMBG_STD, export_onnx
+from src.inference import ARCHITECTURES, load_model
+from src.metrics import SegmentationMetrics
+
+def rembg_inputs(dataset, count, start=0):
+    """
+    Yields up to `count` (input, mask) pairs from a dataset, beginning at
+    index `start`, with the image normalized the way rembg normalizes model
+    inputs.
+    """
+    mean = torch.tensor(REMBG_MEAN).view(3, 1, 1)
+    std = torch.tensor(REMBG_STD).view(3, 1, 1)
+    for i in range(start, min(start + count, len(dataset))):
+        image, mask = dataset[i]
+        yield ((image - mean) / std).unsqueeze(0).numpy(), mask.unsqueeze(0)
+
+class DatasetCalibrationReader(CalibrationDataReader):
+    """Feeds ONNX Runtime's calibrator with samples from a `LogoDataset`."""
+    def __init__(self, dataset, input_name, count):
+        self.input_name = input_name
+        self.samples = rembg_inputs(dataset, count)
+
+    def get_next(self):
+        sample = next(self.samples, None)
+        return None if sample is None else {self.input_name: sample[0]}
+
+def quantize_onnx(fp32_path: str, int8_path: str, calibration_dataset, calibration_samples: int = 64) -> str:
+    """
+    Statically quantizes an exported model to INT8.
+
+    Activation ranges are calibrated on samples from `calibration_dataset`.
+    Weights are quantized per channel to signed INT8 and activations to
+    unsigned INT8, in the QDQ format that ONNX Runtime's CPU provider fuses
+    into integer kernels.
+
+    Args:
+        fp32_path: The exported float model.
+        int8_path: Where to write the quantized model.
+        calibration_dataset: A `LogoDataset` yielding (image, mask) tensors.
+        calibration_samples: Number of samples used for calibration.
+
+    Returns:
+        The path of the quantized model.
+    """
+    input_name = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Shape inference and graph cleanup make more nodes quantizable
+        prepared_path = os.path.join(tmp_dir, "prepared.onnx")
+        quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+
+        quantize_static(
+            prepared_path,
+            int8_path,
+            DatasetCalibrationReader(calibration_dataset, input_name, calibration_samples),
+            quant_format=QuantFormat.QDQ,
+            per_channel=True,
+            weight_type=QuantType.QInt8,
+            activation_type=QuantType.QUInt8,
+        )
+
+    return int8_path
+
+def evaluate_onnx(onnx_path: str, dataset, count: int, start: int = 0, iters_per_sample: int = 1) -> dict:
+    """
+    Measures IoU and latency of an exported model on samples from a dataset.
+
+    Returns:
+        A dict with the model size in MB, the mean latency per image in
+        milliseconds and the dataset-level IoU.
+    """
+    session = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    metrics = SegmentationMetrics(torch.device("cpu"))
+    elapsed = 0.0
+    images = 0
+
+    for x, mask in rembg_inputs(dataset, count, start):
+        began = time.perf_counter()
+        for _ in range(iters_per_sample):
+            probs = session.run(None, {input_name: x})[0]
+        elapsed += (time.perf_counter() - began) / iters_per_sample
+        images += 1
+        metrics.update(torch.logit(torch.from_numpy(probs), eps=1e-6), mask)
+
+    return {
+        "size_mb": os.path.getsize(onnx_path) / 1e6,
+        "latency_ms": elapsed / max(images, 1) * 1000,
+        "iou": metrics.compute()["iou"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize a trained U2-Net to INT8 with ONNX Runtime static quantization.")
+    parser.add_argument("--checkpoint", type=str, required=True, help="Path to the trained weights or training checkpoint.")
+    parser.add_argument("--arch", type=str, choices=list(ARCHITECTURES), default="u2net", help="Model architecture.")
+    parser.add_argument("--input_dir", type=str, required=True, help="Path to the directory of training images.")
+    parser.add_argument("--mask_dir", type=str, required=True, help="Path to the directory of mask images.")
+    parser.add_argument("--output_path", type=str, required=True, help="Path to write the INT8 ONNX model to.")
+    parser.add_argument("--fp32_path", type=str, default=None, help="Existing fp32 ONNX export. Exported from --checkpoint if omitted.")
+    parser.add_argument("--calibration_samples", type=int, default=64, help="Number of validation samples used for calibration.")
+    parser.add_argument("--eval_samples", type=int, default=64, help="Number of validation samples used to compare fp32 and INT8.")
+    args = parser.parse_args()
+
+    transform = transforms.Compose([
+        transforms.Resize((320, 320)),
+        transforms.ToTensor(),
+    ])
+    _, X_val, _, y_val = load_data(args.input_dir, args.mask_dir, lazy=True)
+    val_dataset = LogoDataset(X_val, y_val, transform=transform)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output_path)), exist_ok=True)
+
+    fp32_path = args.fp32_path
+    if fp32_path is None:
+        fp32_path = f"{os.path.splitext(args.output_path)[0]}_fp32.onnx"
+        export_onnx(load_model(args.checkpoint, args.arch), fp32_path)
+        print(f"Exported fp32 model to {fp32_path}")
+
+    quantize_onnx(fp32_path, args.output_path, val_dataset, args.calibration_samples)
+    print(f"INT8 model saved to {args.output_path}")
+
+    # Evaluate on samples not seen during calibration when the split is large enough
+    start = args.calibration_samples if len(val_dataset) > args.calibration_samples else 0
+    fp32 = evaluate_onnx(fp32_path, val_dataset, args.eval_samples, start)
+    int8 = evaluate_onnx(args.output_path, val_dataset, args.eval_samples, start)
+
+    print(f"{'':6} {'size (MB)':>10} {'latency (ms)':>13} {'IoU':>8}")
+    for name, result in (("fp32", fp32), ("int8", int8)):
+        print(f"{name:6} {result['size_mb']:10.1f} {result['latency_ms']:13.2f} {result['iou']:8.4f}")
+    print(f"{'delta':6} {int8['size_mb'] - fp32['size_mb']:10.1f} {int8['latency_ms'] - fp32['latency_ms']:13.2f} "
+          f"{int8['iou'] - fp32['iou']:8.4f}")
+
+if __name__ == "__main__":
+    main()
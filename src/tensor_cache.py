@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import numpy as np
+from pathlib import Path
+from PIL import Image
+from src.image_utils import RESIZE_BACKENDS, preprocess_image, preprocess_parity
+from src.data_loader import load_data
+
+CACHE_VERSION = 1
+INDEX_FILE = "index.json"
+
+class TensorCache:
+    """
+    Persistent cache of preprocessed images and masks stored as memory-mapped
+    NumPy shards.
+
+    Each shard holds a block of uint8 arrays: `images_XXXXX.npy` with shape
+    (N, size, size, 3) and `masks_XXXXX.npy` with shape (N, size, size). The
+    index maps every source image path to its shard and row, together with the
+    modification times of the image and mask and the preprocessing parameters
+    that produced it, so only new or changed files are reprocessed by `build`.
+
+    `draft` and `resize_backend` select the fast decode path of
+    `preprocess_image`; they are part of the parameters, so changing them
+    invalidates the cache.
+    """
+    def __init__(self, cache_dir, size=320, draft=False, resize_backend="pil"):
+        self.cache_dir = Path(cache_dir)
+        self.size = size
+        self.draft = draft
+        self.resize_backend = resize_backend
+        self.entries = {}
+        self._shards = {}
+
+        index_path = self.cache_dir / INDEX_FILE
+        if index_path.exists():
+            with open(index_path) as f:
+                index = json.load(f)
+            # Entries made with other preprocessing settings are unusable
+            if index.get("params") == self.params():
+                self.entries = index["entries"]
+
+    def params(self):
+        """Preprocessing parameters that the cached arrays depend on."""
+        params = {
+            "version": CACHE_VERSION,
+            "size": self.size,
+            "image_resample": "LANCZOS",
+            "mask_resample": "BILINEAR",
+            "background": [255, 255, 255],
+        }
+        # Only recorded when set, so caches built before these options existed stay valid
+        if self.draft:
+            params["draft"] = True
+        if self.resize_backend != "pil":
+            params["resize_backend"] = self.resize_backend
+        return params
+
+    @staticmethod
+    def key(image_path):
+        return os.path.abspath(image_path)
+
+    def __contains__(self, image_path):
+        return self.key(image_path) in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getstate__(self):
+        # Memory maps are reopened lazily in each DataLoader worker
+        state = self.__dict__.copy()
+        state["_shards"] = {}
+        return state
+
+    def get(self, image_path):
+        """
+        Returns read-only (image, mask) array views for a cached source image.
+
+        Args:
+            image_path: The path of the source image.
+
+        Returns:
+            A tuple of a (size, size, 3) image array and a (size, size) mask array.
+        """
+        entry = self.entries[self.key(image_path)]
+        images, masks = self._open_shard(entry["shard"])
+        return images[entry["row"]], masks[entry["row"]]
+
+    def _open_shard(self, shard):
+        if shard not in self._shards:
+            self._shards[shard] = (
+                np.load(self.cache_dir / f"images_{shard:05d}.npy", mmap_mode='r'),
+                np.load(self.cache_dir / f"masks_{shard:05d}.npy", mmap_mode='r'),
+            )
+        return self._shards[shard]
+
+    def _is_fresh(self, entry, image_path, mask_path):
+        return (entry is not None
+                and entry["mask"] == self.key(mask_path)
+                and entry["image_mtime"] == os.stat(image_path).st_mtime_ns
+                and entry["mask_mtime"] == os.stat(mask_path).st_mtime_ns)
+
+    def build(self, image_files, mask_files, shard_size=1024):
+        """
+        Preprocesses the given image/mask pairs into the cache.
+
+        Pairs whose files have not changed since they were cached are kept as
+        they are; only new or modified pairs are decoded. Corrupted images are
+        left out of the cache.
+
+        Args:
+            image_files: Paths of the source images.
+            mask_files: Paths of the matching masks.
+            shard_size: Maximum number of samples per shard file.
+
+        Returns:
+            The number of pairs that were (re)processed.
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._shards = {}
+
+        entries = {}
+        pending = []
+        for image_path, mask_path in zip(image_files, mask_files):
+            key = self.key(image_path)
+            entry = self.entries.get(key)
+            if self._is_fresh(entry, image_path, mask_path):
+                entries[key] = entry
+            else:
+                pending.append((image_path, mask_path))
+
+        next_shard = max((e["shard"] for e in self.entries.values()), default=-1) + 1
+        for start in range(0, len(pending), shard_size):
+            batch = pending[start:start + shard_size]
+            entries.update(self._write_shard(next_shard, batch))
+            next_shard += 1
+
+        self.entries = entries
+        self._write_index()
+        self._remove_unused_shards()
+
+        return len(pending)
+
+    def _write_shard(self, shard, pairs):
+        images = np.lib.format.open_memmap(
+            self.cache_dir / f"images_{shard:05d}.npy", mode='w+', dtype=np.uint8,
+            shape=(len(pairs), self.size, self.size, 3))
+        masks = np.lib.format.open_memmap(
+            self.cache_dir / f"masks_{shard:05d}.npy", mode='w+', dtype=np.uint8,
+            shape=(len(pairs), self.size, self.size))
+
+        entries = {}
+        row = 0
+        for image_path, mask_path in pairs:
+            image = preprocess_image(image_path, draft=self.draft, resize_backend=self.resize_backend)
+            if image is None:
+                continue
+            if image.size != (self.size, self.size):
+                image = image.resize((self.size, self.size), Image.Resampling.LANCZOS)
+            with Image.open(mask_path) as mask:
+                mask = mask.convert("L").resize((self.size, self.size), Image.Resampling.BILINEAR)
+
+            images[row] = np.asarray(image)
+            masks[row] = np.asarray(mask)
+            entries[self.key(image_path)] = {
+                "shard": shard,
+                "row": row,
+                "mask": self.key(mask_path),
+                "image_mtime": os.stat(image_path).st_mtime_ns,
+                "mask_mtime": os.stat(mask_path).st_mtime_ns,
+            }
+            row += 1
+
+        images.flush()
+        masks.flush()
+        del images, masks
+        return entries
+
+    def _write_index(self):
+        index_path = self.cache_dir / INDEX_FILE
+        tmp_path = index_path.with_suffix(".tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump({"params": self.params(), "entries": self.entries}, f)
+        os.replace(tmp_path, index_path)
+
+    def _remove_unused_shards(self):
+        used = {e["shard"] for e in self.entries.values()}
+        for path in self.cache_dir.glob("*_[0-9]*.npy"):
+            if int(path.stem.rsplit("_", 1)[1]) not in used:
+                path.unlink()
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the preprocessed tensor cache for a training set.")
+    parser.add_argument("--input_dir", type=str, required=True, help="Path to the directory of training images.")
+    parser.add_argument("--mask_dir", type=str, required=True, help="Path to the directory of mask images.")
+    parser.add_argument("--cache_dir", type=str, required=True, help="Directory to write the cache shards to.")
+    parser.add_argument("--shard_size", type=int, default=1024, help="Maximum number of samples per shard.")
+    parser.add_argument("--draft", action="store_true", help="Decode JPEGs at reduced scale before resizing.")
+    parser.add_argument("--resize_backend", type=str, choices=RESIZE_BACKENDS, default="pil", help="Resize with Pillow LANCZOS or OpenCV INTER_AREA.")
+    parser.add_argument("--parity_samples", type=int, default=16, help="Images used to check the fast decode path against the reference preprocessing.")
+    parser.add_argument("--max_mean_diff", type=float, default=2.0, help="Largest mean absolute pixel difference (0-255) the fast decode path may introduce.")
+    args = parser.parse_args()
+
+    X_train, X_val, y_train, y_val = load_data(args.input_dir, args.mask_dir, lazy=True)
+
+    if args.draft or args.resize_backend != "pil":
+        parity = preprocess_parity((X_train + X_val)[:args.parity_samples], args.draft, args.resize_backend)
+        print(f"Fast decode parity on {parity['images']} images: mean abs diff {parity['mean_abs_diff']:.2f}, "
+              f"max abs diff {parity['max_abs_diff']}")
+        if parity["mean_abs_diff"] > args.max_mean_diff:
+            parser.error(f"Fast decode differs from the reference preprocessing by more than --max_mean_diff {args.max_mean_diff}.")
+
+    cache = TensorCache(args.cache_dir, draft=args.draft, resize_backend=args.resize_backend)
+    processed = cache.build(X_train + X_val, y_train + y_val, shard_size=args.shard_size)
+    print(f"Tensor cache at {args.cache_dir}: {len(cache)} samples, {processed} (re)processed.")
+
+if __name__ == "__main__":
+    main()
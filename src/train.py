@@ -1,20 +1,66 @@
 import argparse
+import contextlib
 import torch
 import os
-from torch.utils.data import DataLoader, Dataset
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, Dataset, Subset
+from torch.utils.data.distributed import DistributedSampler
 from torchvision import transforms
 from rembg import new_session
 from torch.hub import load_state_dict_from_url
 from tqdm import tqdm
 import time
+import json
 from pathlib import Path
 from PIL import Image
 from sklearn.model_selection import train_test_split
 
-from data_loader import load_data, LogoDataset
+from augment import BatchAugmentation, load_backgrounds
+from data_loader import load_data, BucketBatchSampler, LogoDataset, SyntheticLogoDataset, seed_worker
+from tensor_cache import TensorCache
+from zip_utils import ZipArchive
+from image_utils import RESIZE_BACKENDS, aspect_buckets
+from distributed import cleanup_distributed, init_distributed
+from checkpoint import CheckpointManager, capture_rng_state, rank_state, restore_rng_state, seed_rng
+from losses import REGION_LOSSES, DeepSupervisionLoss
+from memory import reset_peak_memory
+from metrics import SegmentationMetrics
+from inference import EXECUTION_MODES, optimize_model
+from profiling import PHASES, MetricsLog, StepTimer, trace_profiler
+from precision import PRECISIONS, autocast, grad_scaler
 from u2net_model import U2NET
 
 
+def default_num_workers():
+    """Number of DataLoader workers to use when none is given: one per spare core, capped at 8."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    return min(8, max(cpus - 1, 0))
+
+
+def loader_kwargs(args, device):
+    """
+    Builds the DataLoader keyword arguments shared by the training and validation loaders.
+
+    Options left unset on the command line are resolved to defaults that suit the device:
+    pinned memory only when training on CUDA, and persistent workers whenever workers are used.
+    """
+    num_workers = default_num_workers() if args.num_workers is None else args.num_workers
+    pin_memory = device.type == "cuda" if args.pin_memory is None else args.pin_memory
+    kwargs = {
+        "batch_size": args.batch_size,
+        "num_workers": num_workers,
+        "pin_memory": pin_memory,
+    }
+    if num_workers > 0:
+        kwargs["persistent_workers"] = True if args.persistent_workers is None else args.persistent_workers
+        kwargs["prefetch_factor"] = args.prefetch_factor
+        kwargs["worker_init_fn"] = seed_worker
+    return kwargs
+
+
 def main():
     parser = argparse.ArgumentParser(description="Train a U2-Net model for logo detection.")
     parser.add_argument("--input_dir", type=str, required=True, help="Path to the directory of training images.")
@@ -24,8 +70,74 @@ def main():
     parser.add_argument("--batch_size", type=int, default=16, help="Batch size for training.")
     parser.add_argument("--learning_rate", type=float, default=0.001, help="Learning rate for the optimizer.")
     parser.add_argument("--model_path", type=str, default="~/.u2net/u2net.pth", help="Path to the pre-trained model file.")
+    parser.add_argument("--lazy_loading", action="store_true", help="Decode images on demand instead of loading the whole dataset into memory.")
+    parser.add_argument("--cache_dir", type=str, default=None, help="Directory of the preprocessed tensor cache. Implies --lazy_loading.")
+    parser.add_argument("--draft", action="store_true", help="Build the tensor cache with reduced-scale JPEG decoding; must match tensor_cache.py --draft for a prebuilt cache.")
+    parser.add_argument("--resize_backend", type=str, choices=RESIZE_BACKENDS, default="pil", help="Resize backend of the tensor cache; must match tensor_cache.py --resize_backend for a prebuilt cache.")
+    parser.add_argument("--zip_path", type=str, default=None, help="Read --input_dir and --mask_dir as directories inside this zip archive instead of extracting it.")
+    parser.add_argument("--manifest", type=str, default=None, help="Take the image and mask pairs from this corpus index (see src.corpus_index) instead of scanning the directories; duplicates stay within one split.")
+    parser.add_argument("--num_workers", type=int, default=None, help="Number of DataLoader worker processes. Defaults to one per spare core, up to 8.")
+    parser.add_argument("--pin_memory", action=argparse.BooleanOptionalAction, default=None, help="Use pinned host memory for batches. Defaults to on when training on CUDA.")
+    parser.add_argument("--persistent_workers", action=argparse.BooleanOptionalAction, default=None, help="Keep DataLoader workers alive between epochs. Defaults to on when workers are used.")
+    parser.add_argument("--prefetch_factor", type=int, default=4, help="Number of batches each worker loads in advance.")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for shuffling and worker RNGs.")
+    parser.add_argument("--precision", type=str, choices=PRECISIONS, default="fp32", help="Numeric precision for the forward pass and loss (autocast).")
+    parser.add_argument("--checkpoint_dir", type=str, default=None, help="Directory for periodic checkpoints and the best model. Defaults to a 'checkpoints' directory next to --output_path.")
+    parser.add_argument("--checkpoint_every", type=int, default=1, help="Save a checkpoint every N epochs.")
+    parser.add_argument("--keep_checkpoints", type=int, default=3, help="Number of most recent checkpoints to keep.")
+    parser.add_argument("--resume", type=str, nargs="?", const="latest", default=None, help="Resume from a checkpoint file, or from the latest one in --checkpoint_dir if no path is given.")
+    parser.add_argument("--execution_mode", type=str, choices=EXECUTION_MODES, default="eager", help="Run the model eagerly, through torch.compile (falling back to TorchScript), or as a TorchScript trace.")
+    parser.add_argument("--per_image_metrics", type=str, default=None, help="Write the validation scores of every image, keyed by its path, for the latest epoch to this JSON file.")
+    parser.add_argument("--deep_supervision", action="store_true", help="Train on all seven U2NET outputs (d0 and the six side outputs) instead of d0 only.")
+    parser.add_argument("--loss_weights", type=float, nargs=7, default=None, metavar="W", help="Loss weights of d0 to d6 with --deep_supervision. Defaults to 1 for every output.")
+    parser.add_argument("--region_loss", type=str, choices=REGION_LOSSES, default="none", help="Add a soft IoU or Dice loss to the binary cross-entropy of every trained output.")
+    parser.add_argument("--region_weight", type=float, default=1.0, help="Weight of --region_loss relative to the cross-entropy.")
+    parser.add_argument("--accumulate_steps", type=int, default=1, help="Accumulate gradients over N batches per optimizer step, for an effective batch size of N x --batch_size.")
+    parser.add_argument("--activation_checkpointing", action="store_true", help="Recompute the activations of the RSU stages during backward instead of storing them, to fit larger batches.")
+    parser.add_argument("--augment", action="store_true", help="Apply random crop, flip, scale and color jitter to training batches on the training device.")
+    parser.add_argument("--augment_bg_dir", type=str, default=None, help="Directory of background images to swap in behind the logos with --augment.")
+    parser.add_argument("--background_prob", type=float, default=0.5, help="Probability of swapping a training sample's background with --augment_bg_dir.")
+    parser.add_argument("--synthetic_transparent_dir", type=str, default=None, help="Train on composites of these transparent logos generated on the fly, instead of the --input_dir training split.")
+    parser.add_argument("--synthetic_bg_dir", type=str, default=None, help="Background images for --synthetic_transparent_dir.")
+    parser.add_argument("--synthetic_samples", type=int, default=None, help="Synthetic samples per epoch. Defaults to one per logo.")
+    parser.add_argument("--timing", action="store_true", help="Time data wait, host-to-device copy, augmentation, forward, backward and optimizer step separately. Synchronizes CUDA after every phase.")
+    parser.add_argument("--metrics_log", type=str, default=None, help="Append one JSON line per epoch with loss, validation scores, throughput and timing to this file.")
+    parser.add_argument("--profile_dir", type=str, default=None, help="Record a torch.profiler window and export it as a Chrome trace to this directory.")
+    parser.add_argument("--profile_wait", type=int, default=5, help="Training steps to skip before the profiler window starts.")
+    parser.add_argument("--profile_steps", type=int, default=5, help="Training steps recorded in the profiler window.")
+    parser.add_argument("--aspect_buckets", action="store_true", help="Resize every image to the aspect-ratio bucket closest to its shape (about 320x320 pixels each) instead of squashing it to 320x320, and batch images of the same bucket together. Implies --lazy_loading.")
     args = parser.parse_args()
 
+    if args.zip_path and args.cache_dir:
+        parser.error("--cache_dir can only be used with extracted data, not with --zip_path.")
+    if (args.draft or args.resize_backend != "pil") and not args.cache_dir:
+        parser.error("--draft and --resize_backend only apply to the tensor cache and require --cache_dir.")
+    if args.loss_weights and not args.deep_supervision:
+        parser.error("--loss_weights requires --deep_supervision.")
+    # torchrun sets WORLD_SIZE; every flag is validated before joining the process group
+    if int(os.environ.get("WORLD_SIZE", 1)) > 1 and args.execution_mode == "script":
+        parser.error("--execution_mode script is not supported with distributed training.")
+    if bool(args.synthetic_transparent_dir) != bool(args.synthetic_bg_dir):
+        parser.error("--synthetic_transparent_dir and --synthetic_bg_dir must be given together.")
+    if args.augment_bg_dir and not args.augment:
+        parser.error("--augment_bg_dir requires --augment.")
+    if args.checkpoint_every < 1:
+        parser.error("--checkpoint_every must be at least 1.")
+    if args.keep_checkpoints < 1:
+        parser.error("--keep_checkpoints must be at least 1.")
+    if args.accumulate_steps < 1:
+        parser.error("--accumulate_steps must be at least 1.")
+    if args.activation_checkpointing and args.execution_mode == "script":
+        parser.error("--activation_checkpointing can not be traced; use --execution_mode eager or compile.")
+    if args.aspect_buckets and (args.cache_dir or args.synthetic_transparent_dir):
+        parser.error("--aspect_buckets can not be combined with --cache_dir or --synthetic_transparent_dir, which produce 320x320 samples.")
+    if args.aspect_buckets and args.execution_mode == "script":
+        parser.error("--aspect_buckets needs a model that accepts every bucket shape; use --execution_mode eager or compile.")
+
+    # Under torchrun every process runs this script on its own device, with
+    # --batch_size images per process; only rank 0 logs and writes files
+    context = init_distributed()
+
     input_dir = Path(args.input_dir)
     mask_dir = Path(args.mask_dir)
 
@@ -33,62 +145,275 @@ def main():
         transforms.Resize((320, 320)),
         transforms.ToTensor(),
     ])
+    # With buckets the dataset resizes images and masks to their bucket itself
+    buckets = aspect_buckets() if args.aspect_buckets else None
+    if buckets:
+        transform = transforms.ToTensor()
 
-    X_train, X_val, y_train, y_val = load_data(input_dir, mask_dir)
-    
-    train_dataset = LogoDataset(X_train, y_train, transform=transform)
-    val_dataset = LogoDataset(X_val, y_val, transform=transform)
+    archive = ZipArchive(args.zip_path) if args.zip_path else None
+    # Synthetic composites replace the training split, so only the validation
+    # split is read; loading lazily keeps the unused images from being decoded.
+    # Per-image metrics are keyed by path, which only lazy splits keep
+    lazy = (args.lazy_loading or args.cache_dir is not None or args.aspect_buckets
+            or bool(args.synthetic_transparent_dir) or args.per_image_metrics is not None)
+    X_train, X_val, y_train, y_val = load_data(input_dir, mask_dir, lazy=lazy, archive=archive, manifest=args.manifest)
+    if args.synthetic_transparent_dir:
+        X_train, y_train = [], []
+
+    if args.cache_dir:
+        if context.is_main:
+            cache = TensorCache(args.cache_dir, draft=args.draft, resize_backend=args.resize_backend)
+            processed = cache.build(X_train + X_val, y_train + y_val)
+            print(f"Tensor cache at {args.cache_dir}: {len(cache)} samples, {processed} (re)processed.")
+        context.barrier()
+        if not context.is_main:
+            cache = TensorCache(args.cache_dir, draft=args.draft, resize_backend=args.resize_backend)
+        # Cached samples are already 320x320 tensors
+        train_dataset = LogoDataset(X_train, y_train, cache=cache)
+        val_dataset = LogoDataset(X_val, y_val, cache=cache)
+    else:
+        train_dataset = LogoDataset(X_train, y_train, transform=transform, archive=archive, buckets=buckets)
+        val_dataset = LogoDataset(X_val, y_val, transform=transform, archive=archive, buckets=buckets)
 
-    train_loader = DataLoader(train_dataset, batch_size=args.batch_size, shuffle=True)
-    val_loader = DataLoader(val_dataset, batch_size=args.batch_size, shuffle=False)
+    if args.synthetic_transparent_dir:
+        train_dataset = SyntheticLogoDataset(args.synthetic_transparent_dir, args.synthetic_bg_dir,
+                                             length=args.synthetic_samples, transform=transform)
+
+    device = context.device()
+
+    generator = torch.Generator()
+    generator.manual_seed(args.seed)
+    train_sampler = None
+    val_shard = range(context.rank, len(val_dataset), context.world_size)
+    if buckets:
+        # Every batch holds one bucket; processes take turns on each epoch's batch order
+        train_sampler = BucketBatchSampler(train_dataset.sample_buckets, args.batch_size, shuffle=True, seed=args.seed,
+                                           num_replicas=context.world_size, rank=context.rank)
+        val_sampler = BucketBatchSampler([val_dataset.sample_buckets[i] for i in val_shard], args.batch_size, shuffle=False)
+        kwargs = loader_kwargs(args, device)
+        del kwargs["batch_size"]
+        train_loader = DataLoader(train_dataset, batch_sampler=train_sampler, **kwargs)
+        val_loader = DataLoader(Subset(val_dataset, val_shard), batch_sampler=val_sampler, **kwargs)
+        val_order = [val_shard[i] for batch in val_sampler for i in batch]
+    else:
+        if context.enabled:
+            # Every process trains on its own shard of each epoch's shuffle
+            train_sampler = DistributedSampler(train_dataset, num_replicas=context.world_size, rank=context.rank,
+                                               shuffle=True, seed=args.seed)
+            # Validation shards are not padded, so the all-reduced metrics count every image exactly once
+            val_dataset = Subset(val_dataset, val_shard)
+            train_loader = DataLoader(train_dataset, sampler=train_sampler, **loader_kwargs(args, device))
+        else:
+            train_loader = DataLoader(train_dataset, shuffle=True, generator=generator, **loader_kwargs(args, device))
+        val_loader = DataLoader(val_dataset, shuffle=False, **loader_kwargs(args, device))
+        val_order = val_shard if context.enabled else range(len(X_val))
 
     # This will trigger the download of the model if it's not already cached.
-    new_session("u2net")
+    if context.is_main:
+        new_session("u2net")
+    context.barrier()
     model_path = os.path.expanduser(args.model_path)
     
-    model = U2NET()
+    model = U2NET(activation_checkpointing=args.activation_checkpointing)
     model.load_state_dict(torch.load(model_path, map_location=torch.device('cpu'), weights_only=False))
-    
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
     model.to(device)
 
     optimizer = torch.optim.Adam(model.parameters(), lr=args.learning_rate)
-    criterion = torch.nn.BCEWithLogitsLoss()
+    criterion = DeepSupervisionLoss(args.loss_weights, args.region_loss, args.region_weight)
+    scaler = grad_scaler(device, args.precision)
+
+    augment = None
+    if args.augment:
+        backgrounds = load_backgrounds(args.augment_bg_dir, seed=args.seed) if args.augment_bg_dir else None
+        # Each process draws its own augmentations
+        augment = BatchAugmentation(device, seed=args.seed + context.rank, backgrounds=backgrounds,
+                                    background_prob=args.background_prob)
+
+    checkpoint_dir = args.checkpoint_dir or Path(args.output_path).parent / "checkpoints"
+    checkpoints = CheckpointManager(checkpoint_dir, keep_last=args.keep_checkpoints)
+    start_epoch = 0
+    best_iou = float("-inf")
+
+    if args.resume:
+        resume_path = checkpoints.latest() if args.resume == "latest" else args.resume
+        if resume_path is None:
+            if context.is_main:
+                print(f"No checkpoint found in {checkpoint_dir}, starting from scratch.")
+        else:
+            checkpoint = CheckpointManager.load(resume_path, map_location="cpu")
+            model.load_state_dict(checkpoint["model"])
+            optimizer.load_state_dict(checkpoint["optimizer"])
+            scaler.load_state_dict(checkpoint["scaler"])
+            generator.set_state(checkpoint["generator"])
+            start_epoch = checkpoint["epoch"]
+            best_iou = checkpoint["best_iou"]
+            # Every rank continues its own random streams; with a different
+            # number of processes they are reseeded per rank instead
+            rng_state = rank_state(checkpoint["rng"], context.rank, context.world_size)
+            if rng_state is not None:
+                restore_rng_state(rng_state)
+            else:
+                seed_rng(args.seed + context.rank + start_epoch)
+            if augment is not None:
+                augment_state = rank_state(checkpoint.get("augment"), context.rank, context.world_size)
+                if augment_state is not None:
+                    augment.load_state_dict(augment_state)
+                else:
+                    augment.generator.manual_seed(args.seed + context.rank + start_epoch)
+            if context.is_main:
+                print(f"Resumed from {resume_path} after epoch {start_epoch}.")
+
+    train_model = eval_model = model
+    if context.enabled:
+        # Gradients are averaged across processes; evaluation runs on the plain model
+        train_model = DistributedDataParallel(model, device_ids=[device.index] if device.type == "cuda" else None)
+    ddp_model = train_model
+
+    if args.execution_mode != "eager":
+        # TorchScript traces bake in the train/eval behaviour of BatchNorm, so
+        # build one wrapper per mode; checkpoints are always taken from `model`.
+        # A rank's validation shard may be empty, so trace on a training sample;
+        # drawing it must not shift the RNG streams a resumed run relies on
+        rng_state = capture_rng_state()
+        example_images = train_dataset[0][0].unsqueeze(0).to(device)
+        restore_rng_state(rng_state)
+        model.train()
+        model.side_outputs = args.deep_supervision
+        train_model = optimize_model(train_model, args.execution_mode, example_images)
+        model.eval()
+        model.side_outputs = False
+        eval_model = optimize_model(model, args.execution_mode, example_images)
+
+    timer = StepTimer(device, enabled=args.timing)
+    metrics_log = MetricsLog(args.metrics_log) if args.metrics_log and context.is_main else None
+    profiler = trace_profiler(args.profile_dir, args.profile_wait, args.profile_steps, context.rank) if args.profile_dir else None
+    if profiler is not None:
+        profiler.start()
 
-    for epoch in range(args.epochs):
+    for epoch in range(start_epoch, args.epochs):
+        if train_sampler is not None:
+            train_sampler.set_epoch(epoch)
         model.train()
-        for images, masks in tqdm(train_loader, desc=f"Epoch {epoch+1}/{args.epochs}"):
-            images, masks = images.to(device), masks.to(device)
+        # Side outputs are only returned when they are trained on; validation uses d0 alone
+        model.side_outputs = args.deep_supervision
+        reset_peak_memory(device)
+        timer.reset()
+        # Summed on the device so logging the loss does not sync every step
+        loss_sum = torch.zeros((), device=device)
+        optimizer.zero_grad(set_to_none=True)
+        batches = tqdm(timer.iterate(train_loader), total=len(train_loader), desc=f"Epoch {epoch+1}/{args.epochs}", disable=not context.is_main)
+        for step, (images, masks) in enumerate(batches, start=1):
+            with timer.phase("h2d"):
+                images, masks = images.to(device, non_blocking=True), masks.to(device, non_blocking=True)
+            stepping = step % args.accumulate_steps == 0 or step == len(train_loader)
+            # The last group of an epoch may be shorter than --accumulate_steps
+            group_size = min(args.accumulate_steps, len(train_loader) - (step - 1) // args.accumulate_steps * args.accumulate_steps)
+            if augment is not None:
+                with timer.phase("augment"):
+                    images, masks = augment(images, masks)
+
+            # Processes only exchange gradients on the batches that step the optimizer
+            sync = ddp_model.no_sync() if context.enabled and not stepping else contextlib.nullcontext()
+            with sync:
+                with timer.phase("forward"), autocast(device, args.precision):
+                    outputs = train_model(images)
+                    # Scale so the accumulated gradient is the mean over the effective batch
+                    loss = criterion(outputs, masks) / group_size
+                with timer.phase("backward"):
+                    scaler.scale(loss).backward()
+            loss_sum += loss.detach() * group_size
+
+            if stepping:
+                with timer.phase("optimizer"):
+                    scaler.step(optimizer)
+                    scaler.update()
+                    optimizer.zero_grad(set_to_none=True)
 
-            optimizer.zero_grad()
-            outputs = model(images)
-            loss = criterion(outputs[0], masks)
-            loss.backward()
-            optimizer.step()
+            timer.step(images.shape[0])
+            if profiler is not None:
+                profiler.step()
+
+        throughput = timer.summary()
+
+        if context.is_main:
+            print(f"Epoch {epoch+1}/{args.epochs}, peak memory: {throughput['peak_memory_mb']:.0f} MB "
+                  f"(batch size {args.batch_size} x {args.accumulate_steps} accumulation steps, "
+                  f"activation checkpointing {'on' if args.activation_checkpointing else 'off'})")
+            print(f"Epoch {epoch+1}/{args.epochs}, {throughput['samples_per_sec']:.1f} samples/s, "
+                  f"{throughput['starved_steps']}/{throughput['steps']} steps waited on data "
+                  f"({throughput['data_wait_fraction']:.0%} of the time)")
+            if args.timing:
+                print("  " + ", ".join(f"{name}: {throughput[f'{name}_ms']:.1f} ms" for name in PHASES) + " per step")
 
         model.eval()
-        total_iou = 0
+        model.side_outputs = False
+        metrics = SegmentationMetrics(device, per_image=args.per_image_metrics is not None)
+        # Validation is not shuffled, so the loader visits X_val in val_order
+        val_paths = iter(str(X_val[i]) for i in val_order)
         with torch.no_grad():
             for images, masks in val_loader:
-                images, masks = images.to(device), masks.to(device)
-                outputs = model(images)
-                preds = torch.sigmoid(outputs[0]) > 0.5
-                
-                intersection = torch.logical_and(preds, masks).sum()
-                union = torch.logical_or(preds, masks).sum()
-                iou = intersection / union
-                total_iou += iou.item()
-        
-        avg_iou = total_iou / len(val_loader)
-        print(f"Epoch {epoch+1}/{args.epochs}, Validation IoU: {avg_iou:.4f}")
-
-    output_path = Path(args.output_path)
-    if output_path.exists():
-        timestamp = time.strftime("%Y%m%d-%H%M%S")
-        output_path = output_path.with_name(f"{output_path.stem}_{timestamp}{output_path.suffix}")
-    
-    torch.save(model.state_dict(), output_path)
-    print(f"Model saved to {output_path}")
+                images, masks = images.to(device, non_blocking=True), masks.to(device, non_blocking=True)
+                with autocast(device, args.precision):
+                    outputs = eval_model(images)
+                metrics.update(outputs[0], masks, ids=[next(val_paths) for _ in range(images.shape[0])])
+
+        metrics.all_reduce()
+        scores = metrics.compute()
+        saving = (epoch + 1) % args.checkpoint_every == 0 or epoch + 1 == args.epochs
+        # Gathered on every rank, so each one resumes from its own random streams
+        rng_states = context.all_gather(capture_rng_state()) if saving else None
+        augment_states = context.all_gather(augment.state_dict()) if saving and augment is not None else None
+        if not context.is_main:
+            continue
+
+        print(f"Epoch {epoch+1}/{args.epochs}, Validation IoU: {scores['iou']:.4f}, F1: {scores['f1']:.4f}, "
+              f"Precision: {scores['precision']:.4f}, Recall: {scores['recall']:.4f}")
+
+        if metrics_log is not None:
+            metrics_log.write({
+                "epoch": epoch + 1,
+                "train_loss": loss_sum.item() / max(throughput["steps"], 1),
+                "learning_rate": optimizer.param_groups[0]["lr"],
+                "world_size": context.world_size,
+                **{f"val_{name}": value for name, value in scores.items()},
+                **throughput,
+            })
+
+        if args.per_image_metrics:
+            with open(args.per_image_metrics, 'w') as f:
+                json.dump({"epoch": epoch + 1, "images": metrics.per_image_scores()}, f)
+
+        if scores["iou"] > best_iou:
+            best_iou = scores["iou"]
+            best_path = checkpoints.save_best(model.state_dict())
+            print(f"New best model saved to {best_path}")
+
+        if saving:
+            checkpoints.save(epoch + 1, {
+                "epoch": epoch + 1,
+                "model": model.state_dict(),
+                "optimizer": optimizer.state_dict(),
+                "scaler": scaler.state_dict(),
+                "generator": generator.get_state(),
+                "rng": rng_states,
+                "best_iou": best_iou,
+                "augment": augment_states,
+            })
+
+    if profiler is not None:
+        profiler.stop()
+
+    if context.is_main:
+        output_path = Path(args.output_path)
+        if output_path.exists():
+            timestamp = time.strftime("%Y%m%d-%H%M%S")
+            output_path = output_path.with_name(f"{output_path.stem}_{timestamp}{output_path.suffix}")
+
+        torch.save(model.state_dict(), output_path)
+        print(f"Model saved to {output_path}")
+
+    cleanup_distributed()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
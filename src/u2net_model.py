@@ -1,6 +1,9 @@
+import contextlib
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.nn.utils.fusion import fuse_conv_bn_eval
+from torch.utils.checkpoint import checkpoint
 
 class REBNCONV(nn.Module):
     def __init__(self,in_ch=3,out_ch=3,dirate=1):
@@ -17,13 +20,105 @@ class REBNCONV(nn.Module):
 
         return xout
 
+### REBNCONV with BatchNorm folded into the conv, for inference only ###
+class FusedREBNCONV(nn.Module):
+
+    def __init__(self,conv):
+        super(FusedREBNCONV,self).__init__()
+
+        self.conv_s1 = conv
+        self.relu_s1 = nn.ReLU(inplace=True)
+
+    def forward(self,x):
+
+        return self.relu_s1(self.conv_s1(x))
+
+def fuse_for_inference(model, example_input=None, atol=1e-3):
+    """
+    Folds the BatchNorm of every REBNCONV block into its convolution, in place.
+
+    The BatchNorm running statistics and affine parameters are absorbed into
+    the conv weights and bias, so each block runs as a single conv followed
+    by ReLU. The result is only valid in eval mode; the model is switched to
+    eval mode and should not be trained afterwards.
+
+    Args:
+        model: A trained U2NET or U2NETP.
+        example_input: If given, the outputs before and after fusion are
+            compared on this input.
+        atol: Maximum allowed absolute difference between the outputs.
+
+    Returns:
+        The fused model.
+
+    Raises:
+        RuntimeError: If the fused outputs differ by more than `atol`.
+    """
+    model.eval()
+
+    if example_input is not None:
+        with torch.no_grad():
+            reference = model(example_input)
+
+    for module in list(model.modules()):
+        for name, child in module.named_children():
+            if isinstance(child, REBNCONV):
+                setattr(module, name, FusedREBNCONV(fuse_conv_bn_eval(child.conv_s1, child.bn_s1)))
+
+    if example_input is not None:
+        with torch.no_grad():
+            fused = model(example_input)
+        max_diff = max((a - b).abs().max().item() for a, b in zip(reference, fused))
+        if max_diff > atol:
+            raise RuntimeError(f"Fused model output differs by {max_diff:.2e}, more than the tolerance of {atol:.0e}.")
+
+    return model
+
 ## upsample tensor 'src' to have the same spatial size with tensor 'tar'
+## (the size comes from tar's shape, never its values, so torch.compile and
+## TorchScript tracing keep it dynamic)
 def _upsample_like(src,tar):
 
     src = F.interpolate(src,size=tar.shape[2:],mode='bilinear')
 
     return src
 
+## keep the BatchNorm running statistics of 'module' as they are while
+## the block runs; batch statistics are still used for normalization
+@contextlib.contextmanager
+def _preserve_bn_stats(module):
+
+    norms = [m for m in module.modules() if isinstance(m, nn.modules.batchnorm._BatchNorm) and m.track_running_stats]
+    saved = [(m.running_mean.clone(), m.running_var.clone(), m.num_batches_tracked.clone()) for m in norms]
+    try:
+        yield
+    finally:
+        with torch.no_grad():
+            for m, (mean, var, count) in zip(norms, saved):
+                m.running_mean.copy_(mean)
+                m.running_var.copy_(var)
+                m.num_batches_tracked.copy_(count)
+
+## run an RSU stage, recomputing its activations during backward instead of
+## storing them when activation checkpointing is on and gradients are needed
+## (the recomputation leaves the BatchNorm running statistics alone, so they
+## are updated once per step, exactly as without checkpointing)
+def _run_stage(stage,x,checkpointed):
+
+    if checkpointed and torch.is_grad_enabled():
+        calls = []
+
+        def run(x):
+            calls.append(None)
+            if len(calls) == 1:
+                return stage(x)
+            with _preserve_bn_stats(stage):
+                return stage(x)
+
+        return checkpoint(run,x,use_reentrant=False)
+
+    return stage(x)
+
 
 ### RSU-7 ###
 class RSU7(nn.Module):#UNet07DRES(nn.Module):
@@ -317,9 +412,16 @@ class RSU4F(nn.Module):#UNet04FRES(nn.Module):
 ##### U^2-Net ####
 class U2NET(nn.Module):
 
-    def __init__(self,in_ch=3,out_ch=1):
+    def __init__(self,in_ch=3,out_ch=1,side_outputs=True,activation_checkpointing=False):
         super(U2NET,self).__init__()
 
+        # trade compute for memory: RSU stage activations are recomputed in backward
+        self.activation_checkpointing = activation_checkpointing
+
+        # d0 fuses all six side maps, so they are always computed; with
+        # side_outputs=False only d0 is returned, as (d0,)
+        self.side_outputs = side_outputs
+
         self.stage1 = RSU7(in_ch,32,64)
         self.pool12 = nn.MaxPool2d(2,stride=2,ceil_mode=True)
 
@@ -358,43 +460,43 @@ class U2NET(nn.Module):
         hx = x
 
         #stage 1
-        hx1 = self.stage1(hx)
+        hx1 = _run_stage(self.stage1,hx,self.activation_checkpointing)
         hx = self.pool12(hx1)
 
         #stage 2
-        hx2 = self.stage2(hx)
+        hx2 = _run_stage(self.stage2,hx,self.activation_checkpointing)
         hx = self.pool23(hx2)
 
         #stage 3
-        hx3 = self.stage3(hx)
+        hx3 = _run_stage(self.stage3,hx,self.activation_checkpointing)
         hx = self.pool34(hx3)
 
         #stage 4
-        hx4 = self.stage4(hx)
+        hx4 = _run_stage(self.stage4,hx,self.activation_checkpointing)
         hx = self.pool45(hx4)
 
         #stage 5
-        hx5 = self.stage5(hx)
+        hx5 = _run_stage(self.stage5,hx,self.activation_checkpointing)
         hx = self.pool56(hx5)
 
         #stage 6
-        hx6 = self.stage6(hx)
+        hx6 = _run_stage(self.stage6,hx,self.activation_checkpointing)
         hx6up = _upsample_like(hx6,hx5)
 
         #decoder
-        hx5d = self.stage5d(torch.cat((hx6up,hx5),1))
+        hx5d = _run_stage(self.stage5d,torch.cat((hx6up,hx5),1),self.activation_checkpointing)
         hx5dup = _upsample_like(hx5d,hx4)
 
-        hx4d = self.stage4d(torch.cat((hx5dup,hx4),1))
+        hx4d = _run_stage(self.stage4d,torch.cat((hx5dup,hx4),1),self.activation_checkpointing)
         hx4dup = _upsample_like(hx4d,hx3)
 
-        hx3d = self.stage3d(torch.cat((hx4dup,hx3),1))
+        hx3d = _run_stage(self.stage3d,torch.cat((hx4dup,hx3),1),self.activation_checkpointing)
         hx3dup = _upsample_like(hx3d,hx2)
 
-        hx2d = self.stage2d(torch.cat((hx3dup,hx2),1))
+        hx2d = _run_stage(self.stage2d,torch.cat((hx3dup,hx2),1),self.activation_checkpointing)
         hx2dup = _upsample_like(hx2d,hx1)
 
-        hx1d = self.stage1d(torch.cat((hx2dup,hx1),1))
+        hx1d = _run_stage(self.stage1d,torch.cat((hx2dup,hx1),1),self.activation_checkpointing)
 
 
         #side output
@@ -417,14 +519,24 @@ class U2NET(nn.Module):
 
         d0 = self.outconv(torch.cat((d1,d2,d3,d4,d5,d6),1))
 
+        if not self.side_outputs:
+            return (d0,)
+
         return d0, d1, d2, d3, d4, d5, d6
 
 ### U^2-Net small ###
 class U2NETP(nn.Module):
 
-    def __init__(self,in_ch=3,out_ch=1):
+    def __init__(self,in_ch=3,out_ch=1,side_outputs=True,activation_checkpointing=False):
         super(U2NETP,self).__init__()
 
+        # trade compute for memory: RSU stage activations are recomputed in backward
+        self.activation_checkpointing = activation_checkpointing
+
+        # d0 fuses all six side maps, so they are always computed; with
+        # side_outputs=False only d0 is returned, as (d0,)
+        self.side_outputs = side_outputs
+
         self.stage1 = RSU7(in_ch,16,64)
         self.pool12 = nn.MaxPool2d(2,stride=2,ceil_mode=True)
 
@@ -463,43 +575,43 @@ class U2NETP(nn.Module):
         hx = x
 
         #stage 1
-        hx1 = self.stage1(hx)
+        hx1 = _run_stage(self.stage1,hx,self.activation_checkpointing)
         hx = self.pool12(hx1)
 
         #stage 2
-        hx2 = self.stage2(hx)
+        hx2 = _run_stage(self.stage2,hx,self.activation_checkpointing)
         hx = self.pool23(hx2)
 
         #stage 3
-        hx3 = self.stage3(hx)
+        hx3 = _run_stage(self.stage3,hx,self.activation_checkpointing)
         hx = self.pool34(hx3)
 
         #stage 4
-        hx4 = self.stage4(hx)
+        hx4 = _run_stage(self.stage4,hx,self.activation_checkpointing)
         hx = self.pool45(hx4)
 
         #stage 5
-        hx5 = self.stage5(hx)
+        hx5 = _run_stage(self.stage5,hx,self.activation_checkpointing)
         hx = self.pool56(hx5)
 
         #stage 6
-        hx6 = self.stage6(hx)
+        hx6 = _run_stage(self.stage6,hx,self.activation_checkpointing)
         hx6up = _upsample_like(hx6,hx5)
 
         #decoder
-        hx5d = self.stage5d(torch.cat((hx6up,hx5),1))
+        hx5d = _run_stage(self.stage5d,torch.cat((hx6up,hx5),1),self.activation_checkpointing)
         hx5dup = _upsample_like(hx5d,hx4)
 
-        hx4d = self.stage4d(torch.cat((hx5dup,hx4),1))
+        hx4d = _run_stage(self.stage4d,torch.cat((hx5dup,hx4),1),self.activation_checkpointing)
         hx4dup = _upsample_like(hx4d,hx3)
 
-        hx3d = self.stage3d(torch.cat((hx4dup,hx3),1))
+        hx3d = _run_stage(self.stage3d,torch.cat((hx4dup,hx3),1),self.activation_checkpointing)
         hx3dup = _upsample_like(hx3d,hx2)
 
-        hx2d = self.stage2d(torch.cat((hx3dup,hx2),1))
+        hx2d = _run_stage(self.stage2d,torch.cat((hx3dup,hx2),1),self.activation_checkpointing)
         hx2dup = _upsample_like(hx2d,hx1)
 
-        hx1d = self.stage1d(torch.cat((hx2dup,hx1),1))
+        hx1d = _run_stage(self.stage1d,torch.cat((hx2dup,hx1),1),self.activation_checkpointing)
 
 
         #side output
@@ -522,4 +634,7 @@ class U2NETP(nn.Module):
 
         d0 = self.outconv(torch.cat((d1,d2,d3,d4,d5,d6),1))
 
+        if not self.side_outputs:
+            return (d0,)
+
         return d0, d1, d2, d3, d4, d5, d6
@@ -0,0 +1,67 @@
+import os
+import shutil
+import unittest
+import torch
+from PIL import Image
+from src.augment import BatchAugmentation, composite_batch, load_backgrounds
+
+class TestBatchAugmentation(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.masks = (torch.rand(4, 1, 32, 32) > 0.5).float()
+        # The red channel equals the mask, so misalignment shows up as a mismatch
+        self.images = torch.cat((self.masks, torch.rand(4, 2, 32, 32)), dim=1)
+
+    def test_same_seed_reproduces(self):
+        first = BatchAugmentation("cpu", seed=3)(self.images, self.masks)
+        second = BatchAugmentation("cpu", seed=3)(self.images, self.masks)
+        third = BatchAugmentation("cpu", seed=4)(self.images, self.masks)
+        self.assertTrue(torch.equal(first[0], second[0]))
+        self.assertTrue(torch.equal(first[1], second[1]))
+        self.assertFalse(torch.equal(first[0], third[0]))
+
+    def test_image_and_mask_stay_aligned(self):
+        augment = BatchAugmentation("cpu", seed=0, scale_range=(1.0, 1.5), translate=0, brightness=0, contrast=0, saturation=0)
+        images, masks = augment(self.images, self.masks)
+        self.assertEqual(tuple(images.shape), (4, 3, 32, 32))
+        self.assertEqual(tuple(masks.shape), (4, 1, 32, 32))
+        self.assertTrue(torch.allclose(images[:, :1], masks, atol=1e-5))
+
+    def test_zoom_out_fills_white(self):
+        augment = BatchAugmentation("cpu", scale_range=(0.5, 0.5), translate=0, brightness=0, contrast=0, saturation=0)
+        images, masks = augment(self.images, self.masks)
+        self.assertTrue(torch.equal(images[:, :, 0, 0], torch.ones(4, 3)))
+        self.assertTrue(torch.equal(masks[:, :, 0, 0], torch.zeros(4, 1)))
+
+    def test_state_dict_restores_generator(self):
+        augment = BatchAugmentation("cpu", seed=5)
+        state = augment.state_dict()
+        expected = augment(self.images, self.masks)[0]
+        augment.load_state_dict(state)
+        self.assertTrue(torch.equal(augment(self.images, self.masks)[0], expected))
+
+    def test_background_swap(self):
+        backgrounds = torch.zeros(1, 3, 16, 16)
+        augment = BatchAugmentation("cpu", flip_prob=0, scale_range=(1.0, 1.0), translate=0, brightness=0,
+                                    contrast=0, saturation=0, backgrounds=backgrounds, background_prob=1.0)
+        images, masks = augment(self.images, self.masks)
+        self.assertTrue(torch.allclose(images, composite_batch(torch.zeros_like(images), self.images, self.masks), atol=1e-5))
+
+
+class TestLoadBackgrounds(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_backgrounds"
+        os.makedirs(self.test_dir, exist_ok=True)
+        Image.new('RGB', (80, 40), (0, 0, 255)).save(os.path.join(self.test_dir, "wide.jpg"))
+        Image.new('RGB', (30, 60), (255, 0, 0)).save(os.path.join(self.test_dir, "tall.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_load_backgrounds(self):
+        backgrounds = load_backgrounds(self.test_dir, size=16, count=5)
+        self.assertEqual(tuple(backgrounds.shape), (2, 3, 16, 16))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PIL import Image
+from src.benchmark import compare, make_dataset, time_call
+
+class TestBenchmark(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_time_call(self):
+        calls = []
+        result = time_call(lambda: calls.append(1), repeat=5, warmup=2)
+        self.assertEqual(len(calls), 7)
+        self.assertEqual(result["runs"], 5)
+        self.assertLessEqual(result["min_s"], result["median_s"])
+
+    def test_make_dataset_is_reproducible(self):
+        first = make_dataset(os.path.join(self.test_dir, "a"), 2, size=(64, 48))
+        second = make_dataset(os.path.join(self.test_dir, "b"), 2, size=(64, 48))
+        self.assertEqual(sorted(os.listdir(first["masks"])), ["logo_0000.png", "logo_0001.png"])
+        for name in ("logo_0000.png", "logo_0001.png"):
+            with Image.open(os.path.join(first["transparent"], name)) as a, Image.open(os.path.join(second["transparent"], name)) as b:
+                self.assertEqual(a.tobytes(), b.tobytes())
+
+    def test_compare(self):
+        baseline = {"a": {"median_s": 1.0}, "b": {"median_s": 2.0}}
+        results = {"a": {"median_s": 1.5}, "c": {"median_s": 1.0}}
+        self.assertEqual(compare(results, baseline), [("a", 1.0, 1.5, 1.5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
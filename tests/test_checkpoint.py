@@ -0,0 +1,53 @@
+import unittest
+import random
+import shutil
+import tempfile
+import numpy as np
+import torch
+from src.checkpoint import CheckpointManager, capture_rng_state, rank_state, restore_rng_state
+
+class TestCheckpointManager(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_rotation_keeps_last_n(self):
+        manager = CheckpointManager(self.test_dir, keep_last=2)
+        for epoch in range(1, 5):
+            manager.save(epoch, {"epoch": epoch})
+
+        self.assertEqual([p.name for p in manager.checkpoints()],
+                         ["checkpoint_epoch0003.pth", "checkpoint_epoch0004.pth"])
+        self.assertEqual(CheckpointManager.load(manager.latest())["epoch"], 4)
+
+    def test_keep_last_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            CheckpointManager(self.test_dir, keep_last=0)
+
+    def test_no_checkpoint(self):
+        self.assertIsNone(CheckpointManager(self.test_dir).latest())
+
+    def test_save_best_is_plain_state_dict(self):
+        model = torch.nn.Linear(2, 1)
+        path = CheckpointManager(self.test_dir).save_best(model.state_dict())
+        torch.nn.Linear(2, 1).load_state_dict(torch.load(path))
+
+    def test_rng_state_roundtrip(self):
+        state = capture_rng_state()
+        expected = (random.random(), np.random.rand(), torch.rand(1).item())
+
+        restore_rng_state(state)
+        self.assertEqual((random.random(), np.random.rand(), torch.rand(1).item()), expected)
+
+    def test_rank_state(self):
+        states = [{"rank": 0}, {"rank": 1}]
+        self.assertEqual(rank_state(states, 1, 2), {"rank": 1})
+        self.assertIsNone(rank_state(states, 0, 3))
+        self.assertEqual(rank_state({"rank": 0}, 0, 1), {"rank": 0})
+        self.assertIsNone(rank_state(None, 0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from src.corpus_index import CorpusIndex, dhash
+from src.data_loader import load_data
+
+def _noise_image(seed, size=(64, 48)):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8))
+
+class TestCorpusIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.test_dir, "images")
+        self.mask_dir = os.path.join(self.test_dir, "masks")
+        self.manifest = os.path.join(self.test_dir, "corpus.sqlite")
+        os.makedirs(self.input_dir)
+        os.makedirs(self.mask_dir)
+        for i in range(6):
+            self._add(f"logo_{i}.png", _noise_image(i))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _add(self, name, image):
+        image.save(os.path.join(self.input_dir, name))
+        Image.new('L', image.size, 255).save(os.path.join(self.mask_dir, name))
+
+    def test_update_is_incremental(self):
+        with CorpusIndex(self.manifest) as index:
+            self.assertEqual(index.update(self.input_dir, self.mask_dir, workers=1), {"indexed": 6, "unchanged": 0, "removed": 0})
+            self.assertEqual(index.update(self.input_dir, self.mask_dir, workers=1), {"indexed": 0, "unchanged": 6, "removed": 0})
+
+            path = os.path.join(self.input_dir, "logo_0.png")
+            _noise_image(100).save(path)
+            os.utime(path, ns=(0, 0))
+            os.remove(os.path.join(self.input_dir, "logo_1.png"))
+            self.assertEqual(index.update(self.input_dir, self.mask_dir, workers=1), {"indexed": 1, "unchanged": 4, "removed": 1})
+            self.assertEqual(len(index.records()), 5)
+
+    def test_unreadable_and_unmatched_files_are_recorded(self):
+        with open(os.path.join(self.input_dir, "broken.png"), 'wb') as f:
+            f.write(b"not a png")
+        Image.new('L', (8, 8)).save(os.path.join(self.mask_dir, "broken.png"))
+        _noise_image(7).save(os.path.join(self.input_dir, "no_mask.png"))
+
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+            records = {os.path.basename(r["path"]): r for r in index.records(usable_only=False)}
+            self.assertIsNotNone(records["broken.png"]["error"])
+            self.assertIsNone(records["no_mask.png"]["mask_path"])
+            usable = {os.path.basename(r["path"]) for r in index.records()}
+            self.assertEqual(usable, {f"logo_{i}.png" for i in range(6)})
+            self.assertEqual(records["logo_0.png"]["mask_coverage"], 1.0)
+
+    def test_near_duplicates_share_a_group(self):
+        original = Image.open(os.path.join(self.input_dir, "logo_0.png")).resize((640, 480), Image.Resampling.NEAREST)
+        self._add("logo_0_large.png", original)
+        shutil.copy(os.path.join(self.input_dir, "logo_2.png"), os.path.join(self.input_dir, "logo_2_copy.png"))
+        shutil.copy(os.path.join(self.mask_dir, "logo_2.png"), os.path.join(self.mask_dir, "logo_2_copy.png"))
+
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+            records = index.records()
+            groups = dict(zip((os.path.basename(r["path"]) for r in records), index.groups(records)))
+
+        self.assertEqual(groups["logo_0.png"], groups["logo_0_large.png"])
+        self.assertEqual(groups["logo_2.png"], groups["logo_2_copy.png"])
+        self.assertEqual(len(set(groups.values())), 6)
+
+    def test_max_distance_is_stored(self):
+        # A faint overlay moves the difference hash by a couple of bits
+        self._add("logo_0_edited.png", Image.blend(_noise_image(0), _noise_image(9), 0.1))
+
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+            self.assertEqual(len(set(index.groups())), 6)
+            index.set_meta("max_distance", 0)
+        with CorpusIndex(self.manifest) as index:
+            self.assertEqual(index.meta("max_distance"), "0")
+            self.assertEqual(len(set(index.groups())), 7)
+
+    def test_dhash_tolerates_resizing(self):
+        image = _noise_image(0).resize((320, 240), Image.Resampling.BILINEAR)
+        distance = bin(dhash(image) ^ dhash(image.resize((160, 120), Image.Resampling.BILINEAR))).count("1")
+        self.assertLessEqual(distance, 4)
+
+    def test_load_data_keeps_groups_in_one_split(self):
+        for i in range(6):
+            shutil.copy(os.path.join(self.input_dir, f"logo_{i}.png"), os.path.join(self.input_dir, f"logo_{i}_copy.png"))
+            shutil.copy(os.path.join(self.mask_dir, f"logo_{i}.png"), os.path.join(self.mask_dir, f"logo_{i}_copy.png"))
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+
+        X_train, X_val, y_train, y_val = load_data(self.input_dir, self.mask_dir, lazy=True, manifest=self.manifest)
+        self.assertEqual(len(X_train) + len(X_val), 12)
+        self.assertTrue(X_val)
+        self.assertEqual([p.name for p in X_train], [p.name for p in y_train])
+        stems = lambda paths: {p.name.replace("_copy", "") for p in paths}
+        self.assertFalse(stems(X_train) & stems(X_val))
+
+        eager_train, eager_val, _, _ = load_data(self.input_dir, self.mask_dir, manifest=self.manifest)
+        self.assertEqual((len(eager_train), len(eager_val)), (len(X_train), len(X_val)))
+
+
+    def test_load_data_rejects_stale_manifest(self):
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+
+        with self.assertRaises(ValueError):
+            load_data(self.mask_dir, self.mask_dir, lazy=True, manifest=self.manifest)
+        self._add("logo_new.png", _noise_image(50))
+        with self.assertRaises(ValueError):
+            load_data(self.input_dir, self.mask_dir, lazy=True, manifest=self.manifest)
+        os.remove(os.path.join(self.input_dir, "logo_new.png"))
+        os.remove(os.path.join(self.input_dir, "logo_0.png"))
+        with self.assertRaises(ValueError):
+            load_data(self.input_dir, self.mask_dir, lazy=True, manifest=self.manifest)
+
+    def test_load_data_refuses_an_empty_split(self):
+        for i in range(1, 6):
+            shutil.copy(os.path.join(self.input_dir, "logo_0.png"), os.path.join(self.input_dir, f"logo_{i}.png"))
+        with CorpusIndex(self.manifest) as index:
+            index.update(self.input_dir, self.mask_dir, workers=1)
+
+        with self.assertRaises(ValueError):
+            load_data(self.input_dir, self.mask_dir, lazy=True, manifest=self.manifest)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import os
+import shutil
+import tempfile
+from PIL import Image
+from src.create_masks import alpha_to_mask, create_masks
+
+class TestCreateMasks(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.transparent_dir = os.path.join(self.test_dir, "transparent")
+        self.masks_dir = os.path.join(self.test_dir, "masks")
+        os.makedirs(self.transparent_dir)
+
+        image = Image.new('RGBA', (20, 10), (0, 0, 255, 0))
+        image.paste((0, 0, 255, 100), (0, 0, 10, 10))
+        image.save(os.path.join(self.transparent_dir, "logo.png"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_alpha_to_mask_threshold(self):
+        alpha = Image.new('L', (3, 1))
+        alpha.putdata([0, 100, 200])
+        self.assertEqual(list(alpha_to_mask(alpha).getdata()), [0, 255, 255])
+        self.assertEqual(list(alpha_to_mask(alpha, threshold=150).getdata()), [0, 0, 255])
+
+    def test_create_masks(self):
+        create_masks(self.transparent_dir, self.masks_dir, workers=1)
+        mask = Image.open(os.path.join(self.masks_dir, "logo.png"))
+        self.assertEqual(mask.getpixel((0, 0)), 255)
+        self.assertEqual(mask.getpixel((15, 5)), 0)
+
+    def test_up_to_date_masks_are_skipped(self):
+        create_masks(self.transparent_dir, self.masks_dir, workers=1)
+        mask_path = os.path.join(self.masks_dir, "logo.png")
+        mtime = os.path.getmtime(mask_path)
+
+        create_masks(self.transparent_dir, self.masks_dir, workers=1)
+        self.assertEqual(os.path.getmtime(mask_path), mtime)
+
+        # A forced rebuild rewrites the mask even though it looks current
+        os.utime(mask_path, (mtime + 3600, mtime + 3600))
+        create_masks(self.transparent_dir, self.masks_dir, workers=1, force=True)
+        self.assertLess(os.path.getmtime(mask_path), mtime + 3600)
+
+    def test_threshold_change_rebuilds_masks(self):
+        create_masks(self.transparent_dir, self.masks_dir, workers=1)
+        mask_path = os.path.join(self.masks_dir, "logo.png")
+        self.assertEqual(Image.open(mask_path).getpixel((0, 0)), 255)
+
+        create_masks(self.transparent_dir, self.masks_dir, threshold=200, workers=1)
+        self.assertEqual(Image.open(mask_path).getpixel((0, 0)), 0)
+
+if __name__ == '__main__':
+    unittest.main()
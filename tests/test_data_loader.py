@@ -0,0 +1,184 @@
+import unittest
+import os
+import random
+import shutil
+import tempfile
+from pathlib import Path
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision import transforms
+from src.data_loader import load_data, BucketBatchSampler, LogoDataset, SyntheticLogoDataset, seed_worker
+from src.image_utils import aspect_buckets
+
+class TestLazyLoading(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.input_dir = os.path.join(self.test_dir, "images")
+        self.mask_dir = os.path.join(self.test_dir, "masks")
+        os.makedirs(self.input_dir)
+        os.makedirs(self.mask_dir)
+
+        for i in range(10):
+            name = f"logo_{i}.png"
+            Image.new('RGBA', (64, 48), (255, 0, 0, 255)).save(os.path.join(self.input_dir, name))
+            Image.new('L', (64, 48), 255).save(os.path.join(self.mask_dir, name))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_lazy_split_returns_paths(self):
+        X_train, X_val, y_train, y_val = load_data(self.input_dir, self.mask_dir, lazy=True)
+        self.assertEqual(len(X_train) + len(X_val), 10)
+        self.assertTrue(all(isinstance(p, Path) for p in X_train + X_val))
+        # Images and masks must stay paired after the split
+        self.assertEqual([p.name for p in X_train], [p.name for p in y_train])
+        self.assertEqual([p.name for p in X_val], [p.name for p in y_val])
+
+    def test_lazy_split_matches_eager_split(self):
+        X_train, X_val, _, _ = load_data(self.input_dir, self.mask_dir, lazy=True)
+        eager_train, eager_val, _, _ = load_data(self.input_dir, self.mask_dir)
+        self.assertEqual(len(X_train), len(eager_train))
+        self.assertEqual(len(X_val), len(eager_val))
+
+    def test_lazy_getitem_decodes(self):
+        X_train, _, y_train, _ = load_data(self.input_dir, self.mask_dir, lazy=True)
+        image, mask = LogoDataset(X_train, y_train)[0]
+        self.assertEqual(image.mode, 'RGB')
+        self.assertEqual(image.size, (320, 320))
+        self.assertEqual(mask.mode, 'L')
+
+    def test_lazy_getitem_skips_corrupted(self):
+        corrupted = os.path.join(self.input_dir, "logo_0.png")
+        with open(corrupted, 'w') as f:
+            f.write("this is not an image")
+
+        images = sorted(Path(self.input_dir).glob("*.png"))
+        masks = sorted(Path(self.mask_dir).glob("*.png"))
+        image, _ = LogoDataset(images, masks)[0]
+        self.assertEqual(image.size, (320, 320))
+
+    def test_eager_masks_hold_no_file_handles(self):
+        _, _, y_train, y_val = load_data(self.input_dir, self.mask_dir)
+        self.assertTrue(all(getattr(mask, 'fp', None) is None for mask in y_train + y_val))
+
+
+class TestAspectBuckets(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.images, self.masks = [], []
+        for i, size in enumerate([(400, 100), (100, 400), (200, 200), (410, 100), (390, 110)]):
+            image_path = os.path.join(self.test_dir, f"logo_{i}.png")
+            mask_path = os.path.join(self.test_dir, f"mask_{i}.png")
+            Image.new('RGB', size, (0, 0, 255)).save(image_path)
+            Image.new('L', size, 255).save(mask_path)
+            self.images.append(Path(image_path))
+            self.masks.append(Path(mask_path))
+        self.buckets = aspect_buckets()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_samples_are_resized_to_their_bucket(self):
+        dataset = LogoDataset(self.images, self.masks, transform=transforms.ToTensor(), buckets=self.buckets)
+        wide = dataset.sample_buckets[0]
+        self.assertGreater(wide[0], wide[1])
+        self.assertEqual(dataset.sample_buckets[0], dataset.sample_buckets[3])
+        image, mask = dataset[0]
+        self.assertEqual(tuple(image.shape), (3, wide[1], wide[0]))
+        self.assertEqual(tuple(mask.shape), (1, wide[1], wide[0]))
+
+    def test_buckets_require_paths(self):
+        with self.assertRaises(ValueError):
+            LogoDataset([Image.new('RGB', (8, 8))], [Image.new('L', (8, 8))], buckets=self.buckets)
+
+    def test_batches_hold_one_bucket(self):
+        dataset = LogoDataset(self.images, self.masks, transform=transforms.ToTensor(), buckets=self.buckets)
+        sampler = BucketBatchSampler(dataset.sample_buckets, batch_size=2, seed=0)
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(sampler))
+        self.assertEqual(sorted(i for batch in batches for i in batch), list(range(5)))
+        for batch in batches:
+            self.assertEqual(len({dataset.sample_buckets[i] for i in batch}), 1)
+        # Same-bucket batches stack without padding
+        for images, masks in DataLoader(dataset, batch_sampler=sampler):
+            self.assertEqual(images.shape[-2:], masks.shape[-2:])
+
+    def test_epochs_and_replicas(self):
+        sample_buckets = [(1, 1)] * 10 + [(2, 1)] * 7
+        sampler = BucketBatchSampler(sample_buckets, batch_size=3, seed=0)
+        first = list(sampler)
+        sampler.set_epoch(1)
+        self.assertNotEqual(list(sampler), first)
+
+        shards = [list(BucketBatchSampler(sample_buckets, batch_size=3, seed=0, num_replicas=2, rank=rank)) for rank in range(2)]
+        self.assertEqual(len(shards[0]), len(shards[1]))
+        self.assertEqual(len(shards[0]), len(BucketBatchSampler(sample_buckets, batch_size=3, num_replicas=2)))
+        self.assertFalse({i for batch in shards[0] for i in batch} & {i for batch in shards[1] for i in batch})
+
+
+class TestSyntheticLogoDataset(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.transparent_dir = os.path.join(self.test_dir, "transparent")
+        self.bg_dir = os.path.join(self.test_dir, "backgrounds")
+        os.makedirs(self.transparent_dir)
+        os.makedirs(self.bg_dir)
+
+        # A logo whose left half is opaque green and right half transparent
+        logo = Image.new('RGBA', (40, 20), (0, 0, 0, 0))
+        logo.paste((0, 255, 0, 255), (0, 0, 20, 20))
+        logo.save(os.path.join(self.transparent_dir, "logo.png"))
+        Image.new('RGB', (40, 20), (0, 0, 255)).save(os.path.join(self.transparent_dir, "opaque.png"))
+        Image.effect_noise((100, 80), 64).convert('RGB').save(os.path.join(self.bg_dir, "noise.jpg"))
+        # Smaller than the logo, so it has to be scaled up before cropping
+        Image.new('RGB', (10, 10), (255, 0, 0)).save(os.path.join(self.bg_dir, "small.png"))
+
+        self.transform = transforms.Compose([transforms.Resize((320, 320)), transforms.ToTensor()])
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_mask_matches_alpha(self):
+        dataset = SyntheticLogoDataset(self.transparent_dir, self.bg_dir, length=6, transform=self.transform, seed=0)
+        self.assertEqual(len(dataset), 6)
+        for i in range(len(dataset)):
+            image, mask = dataset[i]
+            self.assertEqual(tuple(image.shape), (3, 320, 320))
+            self.assertEqual(tuple(mask.shape), (1, 320, 320))
+            self.assertEqual(mask[0, :, :150].min().item(), 1.0)
+            self.assertEqual(mask[0, :, 170:].max().item(), 0.0)
+            # The logo is composited where the mask is set
+            self.assertTrue(torch.allclose(image[:, 160, 50], torch.tensor([0.0, 1.0, 0.0]), atol=0.02))
+
+    def test_seeded_samples_are_reproducible(self):
+        first = SyntheticLogoDataset(self.transparent_dir, self.bg_dir, length=4, transform=self.transform, seed=1)
+        second = SyntheticLogoDataset(self.transparent_dir, self.bg_dir, length=4, transform=self.transform, seed=1)
+        for i in range(4):
+            self.assertTrue(torch.equal(first[i][0], second[i][0]))
+
+    def test_works_in_workers(self):
+        dataset = SyntheticLogoDataset(self.transparent_dir, self.bg_dir, length=4, transform=self.transform)
+        # Spawned workers do not inherit thread pools other tests started (e.g. ONNX Runtime's)
+        loader = DataLoader(dataset, batch_size=4, num_workers=2, worker_init_fn=seed_worker, multiprocessing_context="spawn")
+        images, masks = next(iter(loader))
+        self.assertEqual(tuple(images.shape), (4, 3, 320, 320))
+
+
+class RandomDataset(Dataset):
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, idx):
+        return random.random()
+
+
+class TestSeedWorker(unittest.TestCase):
+    def test_workers_get_distinct_python_rng(self):
+        loader = DataLoader(RandomDataset(), batch_size=2, num_workers=2, worker_init_fn=seed_worker, multiprocessing_context="spawn")
+        first, second = [batch.tolist() for batch in loader]
+        self.assertNotEqual(first, second)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import numpy as np
+import onnxruntime as ort
+import torch
+from PIL import Image
+from rembg import new_session
+from src.export_onnx import RembgExportWrapper, benchmark_parity, export_onnx
+from src.u2net_model import U2NETP
+
+class TestExportOnnx(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        cls.model = U2NETP().eval()
+        cls.test_dir = tempfile.mkdtemp()
+        # Spatial dimensions are fixed at export time; rembg feeds 320x320 inputs
+        cls.onnx_path = export_onnx(cls.model, os.path.join(cls.test_dir, "u2netp.onnx"))
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.test_dir)
+
+    def test_matches_pytorch(self):
+        session = ort.InferenceSession(self.onnx_path, providers=["CPUExecutionProvider"])
+        x = torch.randn(2, 3, 320, 320)
+        with torch.no_grad():
+            expected = RembgExportWrapper(self.model)(x).numpy()
+        actual = session.run(None, {session.get_inputs()[0].name: x.numpy()})[0]
+
+        self.assertEqual(actual.shape, (2, 1, 320, 320))
+        self.assertLess(np.abs(expected - actual).max(), 1e-4)
+        self.assertLess(benchmark_parity(self.model, self.onnx_path, iters=1)["max_abs_diff"], 1e-4)
+
+    def test_loads_in_rembg_session(self):
+        # rembg only loads custom models from inside its model directory
+        with mock.patch.dict(os.environ, {"U2NET_HOME": self.test_dir}):
+            session = new_session("u2net_custom", model_path=self.onnx_path)
+        masks = session.predict(Image.new('RGB', (120, 80), (255, 0, 0)))
+        self.assertEqual(len(masks), 1)
+        self.assertEqual(masks[0].size, (120, 80))
+        self.assertEqual(masks[0].mode, 'L')
+
+
+if __name__ == '__main__':
+    unittest.main()
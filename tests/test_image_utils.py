@@ -1,7 +1,10 @@
 import unittest
 from PIL import Image
 import os
-from src.image_utils import crop_background, composite_images, preprocess_image
+import random
+import importlib.util
+import numpy as np
+from src.image_utils import aspect_buckets, closest_bucket, crop_background, composite_images, flatten_to_rgb, preprocess_image, preprocess_parity, resize_image
 
 class TestImageUtils(unittest.TestCase):
     def setUp(self):
@@ -14,6 +17,12 @@ class TestImageUtils(unittest.TestCase):
         cropped_image = crop_background(self.background, width, height)
         self.assertEqual(cropped_image.size, (width, height))
 
+    def test_crop_background_seeded_rng(self):
+        background = Image.effect_noise((200, 200), 64)
+        first = crop_background(background, 50, 50, random.Random(7))
+        second = crop_background(background, 50, 50, random.Random(7))
+        self.assertEqual(first.tobytes(), second.tobytes())
+
     def test_crop_background_too_small(self):
         with self.assertRaises(ValueError):
             crop_background(self.background, 300, 300)
@@ -23,6 +32,25 @@ class TestImageUtils(unittest.TestCase):
         # Check a pixel to see if the foreground was pasted
         self.assertEqual(composited_image.getpixel((50, 50)), (0, 255, 0))
 
+    def test_flatten_to_rgb(self):
+        image = flatten_to_rgb(Image.new('RGBA', (10, 10), (0, 0, 0, 0)))
+        self.assertEqual(image.mode, 'RGB')
+        self.assertEqual(image.getpixel((0, 0)), (255, 255, 255))
+
+
+class TestAspectBuckets(unittest.TestCase):
+    def test_buckets_are_network_friendly(self):
+        for width, height in aspect_buckets(320):
+            self.assertEqual(width % 32, 0)
+            self.assertEqual(height % 32, 0)
+            self.assertLess(abs(width * height / 320 ** 2 - 1), 0.1)
+
+    def test_closest_bucket(self):
+        buckets = aspect_buckets(320)
+        self.assertEqual(closest_bucket(500, 500, buckets), (320, 320))
+        self.assertEqual(closest_bucket(1000, 480, buckets), (448, 224))
+        self.assertEqual(closest_bucket(100, 390, buckets), (160, 640))
+
 
 class TestPreprocessImage(unittest.TestCase):
     def setUp(self):
@@ -58,10 +86,41 @@ class TestPreprocessImage(unittest.TestCase):
         self.assertEqual(image.mode, 'RGB')
         self.assertEqual(image.size, (320, 320))
 
+    def test_preprocess_to_bucket(self):
+        image = preprocess_image(self.rgb_path, size=(448, 224))
+        self.assertEqual(image.size, (448, 224))
+
     def test_preprocess_corrupted(self):
         image = preprocess_image(self.corrupted_path)
         self.assertIsNone(image)
 
+    def test_draft_decode_parity(self):
+        # A smooth photo-like JPEG large enough for a 1/4 draft scale
+        gradient = np.linspace(0, 255, 1600, dtype=np.uint8)
+        pixels = np.stack(np.broadcast_arrays(gradient[None, :], gradient[:1200, None], 128), axis=-1)
+        jpeg_path = os.path.join(self.test_dir, "large.jpg")
+        Image.fromarray(pixels.astype(np.uint8)).save(jpeg_path, quality=90)
+
+        image = preprocess_image(jpeg_path, draft=True)
+        self.assertEqual(image.size, (320, 320))
+        parity = preprocess_parity([jpeg_path, self.rgba_path], draft=True)
+        self.assertEqual(parity["images"], 2)
+        self.assertLess(parity["mean_abs_diff"], 1.0)
+        self.assertLessEqual(parity["max_abs_diff"], 8)
+
+    def test_draft_leaves_png_unchanged(self):
+        self.assertEqual(preprocess_image(self.rgba_path, draft=True).tobytes(), preprocess_image(self.rgba_path).tobytes())
+
+    def test_unknown_resize_backend(self):
+        with self.assertRaises(ValueError):
+            resize_image(Image.new('RGB', (10, 10)), (5, 5), backend="magic")
+
+    @unittest.skipIf(importlib.util.find_spec("cv2") is None, "OpenCV is not installed")
+    def test_opencv_resize(self):
+        image = resize_image(Image.new('RGB', (100, 60), (10, 20, 30)), (50, 30), backend="opencv")
+        self.assertEqual(image.size, (50, 30))
+        self.assertEqual(image.getpixel((0, 0)), (10, 20, 30))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from unittest import mock
+import torch
+from src.inference import optimize_model
+from src.u2net_model import U2NETP
+
+class TestOptimizeModel(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = U2NETP().train()
+        self.x = torch.rand(1, 3, 64, 64)
+        self.state = {name: value.clone() for name, value in self.model.state_dict().items()}
+
+    def assert_model_untouched(self):
+        self.assertTrue(self.model.training)
+        for name, value in self.model.state_dict().items():
+            self.assertTrue(torch.equal(value, self.state[name]), name)
+
+    def test_eager_returns_model(self):
+        self.assertIs(optimize_model(self.model, "eager", self.x), self.model)
+
+    def test_script_traces(self):
+        traced = optimize_model(self.model, "script", self.x)
+        self.assertIsInstance(traced, torch.jit.ScriptModule)
+        self.assert_model_untouched()
+        self.model.eval()
+        traced.eval()
+        with torch.no_grad():
+            self.assertEqual(traced(self.x)[0].shape, self.model(self.x)[0].shape)
+
+    def test_compile(self):
+        # A small network keeps compilation fast
+        model = torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3), torch.nn.BatchNorm2d(4)).train()
+        state = {name: value.clone() for name, value in model.state_dict().items()}
+        compiled = optimize_model(model, "compile", self.x)
+        self.assertIsNot(compiled, model)
+        self.assertTrue(model.training)
+        for name, value in model.state_dict().items():
+            self.assertTrue(torch.equal(value, state[name]), name)
+        model.eval()
+        with torch.no_grad():
+            self.assertTrue(torch.allclose(compiled(self.x), model(self.x), atol=1e-5))
+
+    def test_compile_falls_back_to_trace(self):
+        def broken(*args):
+            raise RuntimeError("no compiler")
+
+        with mock.patch("torch.compile", return_value=broken):
+            with self.assertWarns(UserWarning):
+                optimized = optimize_model(self.model, "compile", self.x)
+        self.assertIsInstance(optimized, torch.jit.ScriptModule)
+        self.assert_model_untouched()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+import torch
+from src.losses import DeepSupervisionLoss
+
+class TestDeepSupervisionLoss(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.outputs = tuple(torch.randn(2, 1, 16, 16) for _ in range(7))
+        self.masks = (torch.rand(2, 1, 16, 16) > 0.5).float()
+
+    def test_single_output_matches_bce(self):
+        expected = torch.nn.BCEWithLogitsLoss()(self.outputs[0], self.masks)
+        actual = DeepSupervisionLoss()(self.outputs[:1], self.masks)
+        self.assertTrue(torch.allclose(actual, expected))
+
+    def test_weighted_sum_over_outputs(self):
+        weights = [1.0, 0.5, 0.5, 0.25, 0.25, 0.1, 0.1]
+        bce = torch.nn.BCEWithLogitsLoss()
+        expected = sum(w * bce(o, self.masks) for w, o in zip(weights, self.outputs))
+        actual = DeepSupervisionLoss(weights)(self.outputs, self.masks)
+        self.assertTrue(torch.allclose(actual, expected))
+
+    def test_region_loss_vanishes_for_perfect_predictions(self):
+        logits = (self.masks * 2 - 1) * 50
+        for region_loss in ("iou", "dice"):
+            loss = DeepSupervisionLoss(region_loss=region_loss).per_output((logits,), self.masks)
+            self.assertLess(loss.item(), 1e-3)
+
+    def test_region_loss_adds_to_bce(self):
+        bce = DeepSupervisionLoss()(self.outputs, self.masks)
+        combined = DeepSupervisionLoss(region_loss="dice")(self.outputs, self.masks)
+        self.assertGreater(combined.item(), bce.item())
+
+    def test_weight_count_mismatch_raises(self):
+        with self.assertRaises(ValueError):
+            DeepSupervisionLoss([1.0, 1.0])(self.outputs, self.masks)
+
+    def test_unknown_region_loss_raises(self):
+        with self.assertRaises(ValueError):
+            DeepSupervisionLoss(region_loss="focal")
+
+
+if __name__ == '__main__':
+    unittest.main()
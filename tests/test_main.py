@@ -0,0 +1,63 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image, ImageDraw
+from src.create_masks import alpha_to_mask
+
+# main.py is run as a script and imports its siblings without the package prefix
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from src.main import _init_worker, composite_foreground
+
+class TestCompositeForeground(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.transparent_dir = os.path.join(self.test_dir, "transparent")
+        self.bg_dir = os.path.join(self.test_dir, "bg")
+        self.output_dir = os.path.join(self.test_dir, "output")
+        for directory in (self.transparent_dir, self.bg_dir, self.output_dir):
+            os.makedirs(directory)
+
+        self.logo = Image.new('RGBA', (80, 60), (0, 0, 0, 0))
+        ImageDraw.Draw(self.logo).rectangle((20, 10, 49, 39), fill=(255, 0, 0, 255))
+        self.logo.save(os.path.join(self.transparent_dir, "logo.png"))
+
+        rng = np.random.default_rng(0)
+        for i in range(3):
+            # Backgrounds without any red, so the pasted logo is easy to find
+            pixels = rng.integers(0, 256, (200, 300, 3), dtype=np.uint8)
+            pixels[..., 0] = 0
+            Image.fromarray(pixels).save(os.path.join(self.bg_dir, f"bg_{i}.png"))
+        self.backgrounds = sorted(os.listdir(self.bg_dir))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def _composite(self, seed, per_foreground=2):
+        output_dir = os.path.join(self.output_dir, str(seed))
+        os.makedirs(output_dir, exist_ok=True)
+        _init_worker(self.transparent_dir, self.bg_dir, self.backgrounds, output_dir, cache_size=4)
+        name, written, errors = composite_foreground("logo.png", per_foreground, seed)
+        self.assertEqual((name, written, errors), ("logo.png", per_foreground, []))
+        return [np.asarray(Image.open(os.path.join(output_dir, f"logo_{i:04d}.png"))) for i in range(per_foreground)]
+
+    def test_same_seed_reproduces(self):
+        first = self._composite(seed=1)
+        second = self._composite(seed=1)
+        other = self._composite(seed=2)
+        for a, b in zip(first, second):
+            self.assertTrue(np.array_equal(a, b))
+        self.assertFalse(all(np.array_equal(a, b) for a, b in zip(first, other)))
+
+    def test_mask_lines_up_with_foreground(self):
+        mask = np.asarray(alpha_to_mask(self.logo.getchannel('A'))) > 0
+        for composite in self._composite(seed=3):
+            self.assertEqual(composite.shape[:2], mask.shape)
+            pasted = composite[..., 0] > 0
+            self.assertTrue(np.array_equal(pasted, mask))
+
+
+if __name__ == '__main__':
+    unittest.main()
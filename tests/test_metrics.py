@@ -0,0 +1,89 @@
+import os
+import tempfile
+import unittest
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from src.metrics import SegmentationMetrics, scores_from_counts
+
+def _all_reduce_worker(rank, init_file, results):
+    dist.init_process_group("gloo", init_method=f"file://{init_file}", rank=rank, world_size=2)
+    try:
+        metrics = SegmentationMetrics(torch.device("cpu"), per_image=True)
+        # Rank 0 gets one perfect image, rank 1 one image with nothing found
+        masks = torch.ones(1, 1, 2, 2)
+        metrics.update(torch.full((1, 1, 2, 2), 5.0 if rank == 0 else -5.0), masks, ids=[f"image_{rank}.png"])
+        metrics.all_reduce()
+        results[rank] = (metrics.counts.tolist(), metrics.per_image_scores())
+    finally:
+        dist.destroy_process_group()
+
+class TestSegmentationMetrics(unittest.TestCase):
+    def test_scores_from_counts(self):
+        scores = scores_from_counts(tp=6, fp=2, fn=2)
+        self.assertAlmostEqual(scores["iou"], 0.6)
+        self.assertAlmostEqual(scores["f1"], 0.75)
+        self.assertAlmostEqual(scores["precision"], 0.75)
+        self.assertAlmostEqual(scores["recall"], 0.75)
+
+    def test_empty_prediction_and_mask_is_perfect(self):
+        self.assertEqual(scores_from_counts(0, 0, 0)["iou"], 1.0)
+
+    def test_accumulates_over_dataset(self):
+        metrics = SegmentationMetrics(torch.device("cpu"), per_image=True)
+
+        # First image: 2 of 4 foreground pixels found, no false positives
+        logits = torch.full((1, 1, 2, 2), -5.0)
+        logits[0, 0, 0] = 5.0
+        masks = torch.ones(1, 1, 2, 2)
+        metrics.update(logits, masks, ids=["first.png"])
+
+        # Second image: soft mask values are thresholded at 0.5
+        logits = torch.tensor([[[[5.0, 5.0], [-5.0, -5.0]]]])
+        masks = torch.tensor([[[[0.9, 0.4], [0.2, 0.0]]]])
+        metrics.update(logits, masks, ids=["second.png"])
+
+        scores = metrics.compute()
+        # tp = 2 + 1, fp = 0 + 1, fn = 2 + 0
+        self.assertAlmostEqual(scores["iou"], 3 / 6)
+        self.assertAlmostEqual(scores["precision"], 3 / 4)
+        self.assertAlmostEqual(scores["recall"], 3 / 5)
+
+        per_image = metrics.per_image_scores()
+        self.assertEqual(sorted(per_image), ["first.png", "second.png"])
+        self.assertAlmostEqual(per_image["first.png"]["iou"], 0.5)
+        self.assertAlmostEqual(per_image["second.png"]["iou"], 0.5)
+
+    def test_per_image_needs_ids(self):
+        metrics = SegmentationMetrics(torch.device("cpu"), per_image=True)
+        with self.assertRaises(ValueError):
+            metrics.update(torch.zeros(2, 1, 2, 2), torch.zeros(2, 1, 2, 2), ids=["only_one.png"])
+
+    def test_threshold(self):
+        metrics = SegmentationMetrics(torch.device("cpu"), threshold=0.9)
+        metrics.update(torch.full((1, 1, 1, 1), 1.0), torch.ones(1, 1, 1, 1))
+        self.assertEqual(metrics.compute()["recall"], 0.0)
+
+    def test_all_reduce_without_process_group_is_noop(self):
+        metrics = SegmentationMetrics(torch.device("cpu"))
+        metrics.update(torch.full((1, 1, 2, 2), 5.0), torch.ones(1, 1, 2, 2))
+        metrics.all_reduce()
+        self.assertEqual(metrics.counts.tolist(), [4, 0, 0, 0])
+
+    def test_all_reduce_across_processes(self):
+        # A spawned manager, shut down afterwards, does not inherit threads
+        # other tests started (e.g. ONNX Runtime's) and cannot hang the exit
+        with tempfile.TemporaryDirectory() as tmp_dir, mp.get_context("spawn").Manager() as manager:
+            shared = manager.dict()
+            mp.spawn(_all_reduce_worker, args=(os.path.join(tmp_dir, "init"), shared), nprocs=2)
+            results = dict(shared)
+
+        for rank in range(2):
+            counts, per_image = results[rank]
+            self.assertEqual(counts, [4, 0, 4, 0])
+            self.assertEqual({name: scores["iou"] for name, scores in per_image.items()},
+                             {"image_0.png": 1.0, "image_1.png": 0.0})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import shutil
+import unittest
+import torch
+import torch.nn as nn
+from PIL import Image
+from src.image_utils import aspect_buckets
+from src.predict import PredictDataset, Predictor, list_inputs, output_names
+
+class MeanModel(nn.Module):
+    """Predicts the mean of the input channels as logits, so outputs follow the input exactly."""
+    def forward(self, x):
+        d0 = x.mean(dim=1, keepdim=True)
+        return (d0,) * 7
+
+class TestPredict(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = "test_predict_images"
+        os.makedirs(self.test_dir, exist_ok=True)
+        Image.new('RGB', (300, 100), (255, 0, 0)).save(os.path.join(self.test_dir, "wide.png"))
+        Image.new('RGBA', (1200, 700), (0, 0, 0, 0)).save(os.path.join(self.test_dir, "large.png"))
+        with open(os.path.join(self.test_dir, "corrupted.jpg"), 'w') as f:
+            f.write("this is not an image")
+        self.predictor = Predictor(MeanModel(), torch.device("cpu"))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_dataset_buckets_and_tiles(self):
+        names = list_inputs(self.test_dir)
+        dataset = PredictDataset(names, aspect_buckets(320), tile_min_side=1024, max_side=1000)
+        samples = {os.path.basename(sample["name"]): sample for sample in (dataset[i] for i in range(len(dataset))) if sample}
+
+        self.assertEqual(set(samples), {"wide.png", "large.png"})
+        self.assertEqual(samples["wide.png"]["bucket"], (544, 192))
+        self.assertEqual(tuple(samples["wide.png"]["image"].shape), (3, 192, 544))
+        self.assertTrue(samples["large.png"]["tiled"])
+        self.assertEqual(samples["large.png"]["size"], (1200, 700))
+        self.assertEqual(max(samples["large.png"]["image"].shape), 1000)
+
+    def test_predict_batch_restores_size(self):
+        sample = {"size": (300, 100), "image": torch.zeros(3, 192, 544)}
+        probs = self.predictor.predict_batch([sample, sample])
+        self.assertEqual(len(probs), 2)
+        self.assertEqual(tuple(probs[0].shape), (100, 300))
+        self.assertTrue(torch.allclose(probs[0], torch.full((100, 300), 0.5)))
+
+    def test_predict_tiled_blends_seamlessly(self):
+        image = torch.rand(3, 500, 700)
+        probs = self.predictor.predict_tiled({"size": (700, 500), "image": image}, tile_size=320, overlap=64, batch_size=3)
+        self.assertEqual(tuple(probs.shape), (500, 700))
+        self.assertTrue(torch.allclose(probs, torch.sigmoid(image.mean(dim=0)), atol=1e-5))
+
+    def test_predict_tiled_pads_small_sides(self):
+        probs = self.predictor.predict_tiled({"size": (700, 200), "image": torch.zeros(3, 200, 700)}, tile_size=320)
+        self.assertEqual(tuple(probs.shape), (200, 700))
+
+    def test_output_names_keep_relative_paths(self):
+        output_dir = os.path.realpath("masks")
+        outputs = output_names(["a/logo.png", "b/logo.jpg"], "masks")
+        self.assertEqual(outputs, {"a/logo.png": os.path.join(output_dir, "a", "logo.png"),
+                                   "b/logo.jpg": os.path.join(output_dir, "b", "logo.png")})
+        outputs = output_names([os.path.join(self.test_dir, "wide.png")], "masks", self.test_dir)
+        self.assertEqual(outputs, {os.path.join(self.test_dir, "wide.png"): os.path.join(output_dir, "wide.png")})
+
+    def test_output_names_refuse_collisions(self):
+        with self.assertRaises(ValueError):
+            output_names(["logo.jpg", "logo.png"], "masks")
+
+    def test_output_names_stay_in_output_dir(self):
+        for name in ("../logo.png", "a/../../logo.png", "/tmp/logo.png"):
+            with self.assertRaises(ValueError):
+                output_names([name], "masks")
+
+if __name__ == '__main__':
+    unittest.main()
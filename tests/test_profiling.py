@@ -0,0 +1,65 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import torch
+from src.profiling import PHASES, MetricsLog, StepTimer
+
+def _slow_batches(delays):
+    for delay in delays:
+        time.sleep(delay)
+        yield torch.zeros(2, 3)
+
+class TestStepTimer(unittest.TestCase):
+    def test_counts_starved_steps(self):
+        timer = StepTimer(torch.device("cpu"), starvation_ms=20)
+        for batch in timer.iterate(_slow_batches([0.0, 0.05, 0.0])):
+            with timer.phase("forward"):
+                time.sleep(0.01)
+            timer.step(batch.shape[0])
+
+        summary = timer.summary()
+        self.assertEqual(summary["steps"], 3)
+        self.assertEqual(summary["starved_steps"], 1)
+        self.assertGreater(summary["samples_per_sec"], 0)
+        self.assertGreaterEqual(summary["forward_ms"], 10)
+        self.assertTrue(all(f"{name}_ms" in summary for name in PHASES))
+
+    def test_disabled_only_times_data(self):
+        timer = StepTimer(torch.device("cpu"), enabled=False)
+        for batch in timer.iterate(_slow_batches([0.0])):
+            with timer.phase("forward"):
+                pass
+            timer.step(batch.shape[0])
+        summary = timer.summary()
+        self.assertIn("data_ms", summary)
+        self.assertNotIn("forward_ms", summary)
+
+    def test_reset(self):
+        timer = StepTimer(torch.device("cpu"))
+        timer.step(4)
+        timer.reset()
+        self.assertEqual(timer.summary()["steps"], 0)
+
+
+class TestMetricsLog(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_appends_json_lines(self):
+        path = os.path.join(self.test_dir, "logs", "metrics.jsonl")
+        log = MetricsLog(path)
+        log.write({"epoch": 1, "val_iou": 0.5})
+        log.write({"epoch": 2, "val_iou": 0.6})
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["epoch"] for r in records], [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import onnxruntime as ort
+import torch
+from PIL import Image
+from torchvision import transforms
+from src.data_loader import LogoDataset
+from src.export_onnx import export_onnx
+from src.quantize import evaluate_onnx, quantize_onnx, rembg_inputs
+from src.u2net_model import U2NETP
+
+class TestQuantize(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        rng = np.random.default_rng(0)
+        images, masks = [], []
+        for i in range(4):
+            image_path = Path(self.test_dir) / f"image_{i}.png"
+            mask_path = Path(self.test_dir) / f"mask_{i}.png"
+            Image.fromarray(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8)).save(image_path)
+            Image.fromarray(rng.integers(0, 2, (120, 160), dtype=np.uint8) * 255).save(mask_path)
+            images.append(image_path)
+            masks.append(mask_path)
+        transform = transforms.Compose([transforms.Resize((320, 320)), transforms.ToTensor()])
+        self.dataset = LogoDataset(images, masks, transform=transform)
+
+        torch.manual_seed(0)
+        self.fp32_path = export_onnx(U2NETP().eval(), os.path.join(self.test_dir, "fp32.onnx"))
+        self.int8_path = os.path.join(self.test_dir, "int8.onnx")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_static_quantization(self):
+        quantize_onnx(self.fp32_path, self.int8_path, self.dataset, calibration_samples=3)
+        self.assertLess(os.path.getsize(self.int8_path), os.path.getsize(self.fp32_path))
+
+        fp32 = ort.InferenceSession(self.fp32_path, providers=["CPUExecutionProvider"])
+        int8 = ort.InferenceSession(self.int8_path, providers=["CPUExecutionProvider"])
+        x, _ = next(rembg_inputs(self.dataset, 1, start=3))
+        expected = fp32.run(None, {fp32.get_inputs()[0].name: x})[0]
+        actual = int8.run(None, {int8.get_inputs()[0].name: x})[0]
+
+        self.assertEqual(actual.shape, (1, 1, 320, 320))
+        self.assertLess(np.abs(expected - actual).max(), 0.01)
+
+        result = evaluate_onnx(self.int8_path, self.dataset, count=2)
+        self.assertTrue(0 <= result["iou"] <= 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from PIL import Image
+from torchvision import transforms
+from src.data_loader import LogoDataset
+from src.tensor_cache import TensorCache
+
+class TestTensorCache(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.test_dir, "cache")
+        self.images = []
+        self.masks = []
+
+        for i in range(5):
+            image_path = Path(self.test_dir) / f"logo_{i}.png"
+            mask_path = Path(self.test_dir) / f"mask_{i}.png"
+            Image.new('RGBA', (80, 40), (10 * i, 0, 0, 200)).save(image_path)
+            Image.new('L', (80, 40), 255).save(mask_path)
+            self.images.append(image_path)
+            self.masks.append(mask_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_build_and_get(self):
+        cache = TensorCache(self.cache_dir)
+        self.assertEqual(cache.build(self.images, self.masks, shard_size=2), 5)
+        self.assertEqual(len(cache), 5)
+
+        image, mask = cache.get(self.images[3])
+        self.assertEqual(image.shape, (320, 320, 3))
+        self.assertEqual(mask.shape, (320, 320))
+
+    def test_rebuild_only_processes_changed_files(self):
+        TensorCache(self.cache_dir).build(self.images, self.masks)
+
+        stat = os.stat(self.images[1])
+        os.utime(self.images[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        cache = TensorCache(self.cache_dir)
+        self.assertEqual(cache.build(self.images, self.masks), 1)
+        self.assertEqual(len(cache), 5)
+        self.assertEqual(cache.get(self.images[1])[0].shape, (320, 320, 3))
+
+    def test_changed_params_invalidate_cache(self):
+        TensorCache(self.cache_dir).build(self.images, self.masks)
+        cache = TensorCache(self.cache_dir, size=160)
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(len(TensorCache(self.cache_dir, draft=True)), 0)
+        self.assertEqual(len(TensorCache(self.cache_dir)), 5)
+
+    def test_dataset_matches_uncached_pipeline(self):
+        cache = TensorCache(self.cache_dir)
+        cache.build(self.images, self.masks)
+
+        transform = transforms.Compose([
+            transforms.Resize((320, 320)),
+            transforms.ToTensor(),
+        ])
+        cached_image, cached_mask = LogoDataset(self.images, self.masks, cache=cache)[2]
+        image, mask = LogoDataset(self.images, self.masks, transform=transform)[2]
+
+        self.assertEqual(cached_image.shape, image.shape)
+        self.assertEqual(cached_mask.shape, mask.shape)
+        self.assertLess((cached_image - image).abs().max().item(), 1e-6)
+        self.assertLess((cached_mask - mask).abs().max().item(), 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import torch
+from src.u2net_model import U2NETP, FusedREBNCONV, fuse_for_inference
+
+class TestFuseForInference(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = U2NETP()
+        # Give BatchNorm non-trivial statistics to fold
+        self.model.train()
+        with torch.no_grad():
+            self.model(torch.rand(2, 3, 64, 64))
+        self.model.eval()
+        self.input = torch.rand(1, 3, 64, 64)
+
+    def test_outputs_match(self):
+        with torch.no_grad():
+            expected = self.model(self.input)
+        fuse_for_inference(self.model, self.input)
+        with torch.no_grad():
+            actual = self.model(self.input)
+
+        for a, b in zip(expected, actual):
+            self.assertLess((a - b).abs().max().item(), 1e-3)
+
+    def test_no_batchnorm_left(self):
+        fuse_for_inference(self.model)
+        self.assertFalse(any(isinstance(m, torch.nn.BatchNorm2d) for m in self.model.modules()))
+        self.assertTrue(isinstance(self.model.stage1.rebnconvin, FusedREBNCONV))
+
+    def test_tolerance_violation_raises(self):
+        with self.assertRaises(RuntimeError):
+            fuse_for_inference(self.model, self.input, atol=0.0)
+
+
+class TestSideOutputs(unittest.TestCase):
+    def test_d0_only(self):
+        torch.manual_seed(0)
+        model = U2NETP().eval()
+        x = torch.rand(1, 3, 64, 64)
+        with torch.no_grad():
+            full = model(x)
+            model.side_outputs = False
+            d0_only = model(x)
+
+        self.assertEqual(len(full), 7)
+        self.assertEqual(len(d0_only), 1)
+        self.assertTrue(torch.equal(full[0], d0_only[0]))
+
+
+class TestActivationCheckpointing(unittest.TestCase):
+    def test_gradients_match(self):
+        torch.manual_seed(0)
+        model = U2NETP()
+        x = torch.rand(2, 3, 64, 64)
+
+        gradients = []
+        for enabled in (False, True):
+            model.zero_grad()
+            model.activation_checkpointing = enabled
+            model(x)[0].sum().backward()
+            gradients.append([p.grad.clone() for p in model.parameters()])
+
+        for a, b in zip(*gradients):
+            self.assertTrue(torch.allclose(a, b, atol=1e-5))
+
+    def test_batchnorm_statistics_match(self):
+        torch.manual_seed(0)
+        x = torch.rand(2, 3, 64, 64)
+        reference = U2NETP()
+        checkpointed = U2NETP(activation_checkpointing=True)
+        checkpointed.load_state_dict(reference.state_dict())
+
+        for model in (reference, checkpointed):
+            model.train()
+            model(x)[0].sum().backward()
+
+        for name, buffer in reference.state_dict().items():
+            if "running" in name or "num_batches_tracked" in name:
+                self.assertTrue(torch.allclose(buffer, checkpointed.state_dict()[name], atol=1e-6), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import unittest
+import io
+import os
+import pickle
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+from PIL import Image
+from src.data_loader import load_data, LogoDataset
+from src.zip_utils import ZipArchive, extract_incremental
+
+def _png_bytes(color, mode='RGB'):
+    buffer = io.BytesIO()
+    Image.new(mode, (40, 30), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class TestZipArchive(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.test_dir, "data.zip")
+
+        with zipfile.ZipFile(self.zip_path, 'w') as zf:
+            for i in range(8):
+                compression = zipfile.ZIP_STORED if i % 2 else zipfile.ZIP_DEFLATED
+                zf.writestr(f"data/images/{i}.png", _png_bytes((i * 30, 0, 0)), compress_type=compression)
+                zf.writestr(f"data/masks/{i}.png", _png_bytes(255, 'L'), compress_type=compression)
+            zf.writestr("data/images/notes.txt", b"not an image")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_read_matches_zipfile(self):
+        archive = ZipArchive(self.zip_path)
+        with zipfile.ZipFile(self.zip_path) as zf:
+            for name in zf.namelist():
+                self.assertEqual(bytes(archive.read(name)), zf.read(name))
+
+    def test_pickled_archive_reopens(self):
+        archive = ZipArchive(self.zip_path)
+        archive.read("data/images/1.png")
+        clone = pickle.loads(pickle.dumps(archive))
+        self.assertEqual(bytes(clone.read("data/images/1.png")), bytes(archive.read("data/images/1.png")))
+
+    def test_open_stored_member_without_copy(self):
+        archive = ZipArchive(self.zip_path)
+        f = archive.open("data/images/1.png")
+        self.assertNotIsInstance(f, io.BytesIO)
+        self.assertEqual(Image.open(f).getpixel((0, 0)), (30, 0, 0))
+        f.seek(0)
+        self.assertEqual(f.read(), bytes(archive.read("data/images/1.png")))
+        self.assertEqual(Image.open(archive.open("data/images/2.png")).getpixel((0, 0)), (60, 0, 0))
+
+    def test_forked_worker_reopens_archive(self):
+        archive = ZipArchive(self.zip_path)
+        archive.read("data/images/1.png")
+        parent_mmap = archive._mmap
+        # A real fork would inherit the threads other tests started (e.g.
+        # ONNX Runtime's) and can hang the run; a new pid is all the archive sees
+        child_pid = os.getpid() + 1
+        with mock.patch.object(os, "getpid", return_value=child_pid):
+            self.assertEqual(bytes(archive.read("data/images/3.png")), _png_bytes((90, 0, 0)))
+        self.assertEqual(archive._pid, child_pid)
+        self.assertIsNot(archive._mmap, parent_mmap)
+
+    def test_missing_archive(self):
+        with self.assertRaises(FileNotFoundError):
+            ZipArchive(os.path.join(self.test_dir, "missing.zip"))
+
+    def test_load_data_from_archive(self):
+        archive = ZipArchive(self.zip_path)
+        X_train, X_val, y_train, y_val = load_data("data/images", "data/masks", lazy=True, archive=archive)
+        self.assertEqual(len(X_train) + len(X_val), 8)
+
+        image, mask = LogoDataset(X_train, y_train, archive=archive)[0]
+        self.assertEqual(image.size, (320, 320))
+        self.assertEqual(mask.mode, 'L')
+
+
+
+class TestExtractIncremental(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.zip_path = os.path.join(self.test_dir, "data.zip")
+        self.destination = os.path.join(self.test_dir, "out")
+
+        with zipfile.ZipFile(self.zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for i in range(6):
+                zf.writestr(f"images/{i}.png", _png_bytes((i * 40, 0, 0)))
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_extracts_all_members(self):
+        summary = extract_incremental(self.zip_path, self.destination, workers=3)
+        self.assertEqual(summary["extracted"], 6)
+        with zipfile.ZipFile(self.zip_path) as zf:
+            for name in zf.namelist():
+                with open(os.path.join(self.destination, name), 'rb') as f:
+                    self.assertEqual(f.read(), zf.read(name))
+
+    def test_only_missing_or_changed_files_are_extracted(self):
+        extract_incremental(self.zip_path, self.destination)
+        os.remove(os.path.join(self.destination, "images/0.png"))
+        with open(os.path.join(self.destination, "images/1.png"), 'wb') as f:
+            f.write(b"truncated")
+
+        summary = extract_incremental(self.zip_path, self.destination)
+        self.assertEqual(summary["extracted"], 2)
+        self.assertEqual(summary["skipped"], 4)
+
+    def test_rejects_members_outside_destination(self):
+        with zipfile.ZipFile(self.zip_path, 'a') as zf:
+            zf.writestr("../evil.txt", b"x")
+        with self.assertRaises(ValueError):
+            extract_incremental(self.zip_path, self.destination)
+
+
+if __name__ == '__main__':
+    unittest.main()